@@ -5,17 +5,24 @@ This creates a bridge between Azure AI models and the MCP server
 """
 
 import asyncio
+import contextlib
 import json
+import math
 import os
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 from azure.ai.inference import ChatCompletionsClient
 from azure.ai.inference.models import SystemMessage, UserMessage, AssistantMessage, ToolMessage
 from azure.core.credentials import AzureKeyCredential
-from azure.identity import DefaultAzureCredential, ManagedIdentityCredential
+from azure.identity import ManagedIdentityCredential
+import random
 import sys
-import requests
+import time
+import aiohttp
+import orjson
+from jsonschema import Draft7Validator, ValidationError
 
 # Configure logging early so logger is available for dotenv loading
 logging.basicConfig(level=logging.INFO)
@@ -28,11 +35,11 @@ def _try_load_dotenv():
         dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
         if os.path.exists(dotenv_path):
             load_dotenv(dotenv_path)
-            logger.info(f"Loaded environment variables from {dotenv_path}")
+            logger.info("Loaded environment variables from %s", dotenv_path)
     except ImportError:
         logger.warning("python-dotenv not installed; skipping .env loading.")
     except Exception as e:
-        logger.warning(f"Could not load .env file: {e}")
+        logger.warning("Could not load .env file: %s", e)
 
 _try_load_dotenv()
 
@@ -44,21 +51,137 @@ from hjmcpsse.tools.calculator import calculate
 from hjmcpsse.resources.filesystem import list_directory, get_file_content
 from hjmcpsse.prompts.code_generator import generate_code_prompt, get_code_template
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Token scope for Azure OpenAI / Azure AI services when using Entra ID auth
+_COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+# HTTP statuses worth retrying: timeouts, throttling and transient server errors
+_RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Streamed completions can take minutes, so only time out when the stream stalls
+# rather than applying the session's 60s total limit to the whole response
+_STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_read=60)
+
+# First Azure OpenAI api-version accepting stream_options (usage in streamed responses)
+_STREAM_USAGE_API_VERSION = "2024-09-01"
+
+@lru_cache(maxsize=256)
+def _cached_code_prompt(
+    description: str,
+    language: str,
+    style: str,
+    include_tests: bool,
+    include_docs: bool
+) -> Tuple[str, Tuple[str, ...]]:
+    """Prompt generation is pure, so identical requests reuse the first result"""
+    prompt_result = generate_code_prompt(
+        description=description,
+        language=language,
+        style=style,
+        include_tests=include_tests,
+        include_docs=include_docs
+    )
+    return prompt_result.prompt, tuple(prompt_result.suggestions)
+
+def _compact_history(messages: List[Dict[str, Any]], keep_tool_turns: int) -> List[Dict[str, Any]]:
+    """Drop all but the last `keep_tool_turns` tool exchanges from the history
+
+    An exchange is an assistant message carrying tool_calls plus the tool
+    messages answering it; it is kept or dropped as a unit so every tool
+    message still follows its tool call. All other messages are kept.
+    """
+    exchange_starts = [
+        i for i, msg in enumerate(messages)
+        if msg.get("role") == "assistant" and msg.get("tool_calls")
+    ]
+    if len(exchange_starts) <= keep_tool_turns:
+        return messages
+    if keep_tool_turns > 0:
+        dropped_before = exchange_starts[-keep_tool_turns]
+    else:
+        dropped_before = len(messages)
+    compacted = []
+    in_dropped_exchange = False
+    for i, msg in enumerate(messages):
+        role = msg.get("role")
+        if i < dropped_before and role == "assistant" and msg.get("tool_calls"):
+            in_dropped_exchange = True
+            continue
+        if in_dropped_exchange and role == "tool":
+            continue
+        in_dropped_exchange = False
+        compacted.append(msg)
+    return compacted
+
+def _has_non_finite_float(obj: Any) -> bool:
+    """Whether obj holds inf or nan anywhere inside its dicts and lists"""
+    pending = [obj]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+    return False
 
-@dataclass
+def _huge_ints_to_hex(obj: Any) -> Any:
+    """Copy obj with ints too long for a decimal string replaced by hex strings"""
+    if isinstance(obj, int) and not isinstance(obj, bool):
+        try:
+            str(obj)
+        except ValueError:
+            return hex(obj)
+        return obj
+    if isinstance(obj, dict):
+        return {key: _huge_ints_to_hex(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_huge_ints_to_hex(value) for value in obj]
+    return obj
+
+def _dumps(obj: Any) -> bytes:
+    """Encode JSON with orjson, falling back to json for values orjson would alter or reject
+    
+    orjson writes inf/nan as null and rejects ints beyond 64 bits; json keeps
+    both as the API received them before. Ints past the interpreter's int-to-str
+    digit limit can't be written as numbers at all and are sent as hex strings.
+    """
+    if not _has_non_finite_float(obj):
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. an int beyond 64 bits
+    try:
+        return json.dumps(obj).encode()
+    except ValueError:
+        return json.dumps(_huge_ints_to_hex(obj)).encode()
+
+async def _read_json_response(response: aiohttp.ClientResponse) -> Dict[str, Any]:
+    """Decode a successful JSON response, raising with the body text otherwise"""
+    if response.status not in (200, 201):
+        error_text = await response.text()
+        logger.error("REST API call failed: %s", error_text)
+        raise Exception(f"REST API call failed: {error_text}")
+    return orjson.loads(await response.read())
+
+@dataclass(frozen=True, slots=True)
 class AzureAIConfig:
     """Configuration for Azure AI Foundry connection"""
     endpoint: str
     model_name: str
     api_key: Optional[str] = None
     api_version: str = "2024-02-15-preview"  # Common API version for Azure OpenAI
-    use_managed_identity: bool = True
+    use_managed_identity: Optional[bool] = None  # None: managed identity only when no api_key is given
     max_tokens: int = 4000
     temperature: float = 0.7
     deployment_name: Optional[str] = None  # Sometimes different from model_name
+    history_window: Optional[int] = None  # Opt-in: re-send only the last N tool exchanges (None keeps all)
+    retry_attempts: int = 4  # Total attempts per REST call, including the first
+    retry_base_delay: float = 0.5  # Seconds; doubled after each failed attempt
+    retry_max_delay: float = 8.0  # Upper bound on the backoff delay
+    max_retry_after: float = 60.0  # Longest server Retry-After to wait out; longer ones fail the call
+    token_budget: Optional[int] = None  # Stop the tool loop once this many tokens are spent
 
 class MCPToolRegistry:
     """Registry of MCP tools available to Azure AI models"""
@@ -164,87 +287,110 @@ class MCPToolRegistry:
             }
         }
     
+        self.tools_list = list(self.tools.values())
+        self.tools_json = _dumps(self.tools_list)
+        # Compile each tool's parameter schema once so arguments are checked before dispatch
+        self._validators = {
+            name: Draft7Validator(tool["function"]["parameters"]) for name, tool in self.tools.items()
+        }
+        self._dispatch: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+            "calculator": self._tool_calculator,
+            "browse_filesystem": self._tool_browse_filesystem,
+            "get_code_template": self._tool_get_code_template,
+            "generate_code_prompt": self._tool_generate_code_prompt,
+        }
+    
     async def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a tool with the given arguments"""
+        handler = self._dispatch.get(tool_name)
+        if handler is None:
+            return {
+                "success": False,
+                "error": f"Unknown tool: {tool_name}"
+            }
         try:
-            if tool_name == "calculator":
-                result = calculate(arguments["expression"])
-                return {
-                    "success": True,
-                    "data": {
-                        "expression": result.expression,
-                        "result": result.result,
-                        "success": result.success,
-                        "error": result.error
-                    }
-                }
-            
-            elif tool_name == "browse_filesystem":
-                path = arguments["path"]
-                action = arguments["action"]
-                
-                if action == "list":
-                    listing = list_directory(path)
-                    return {
-                        "success": True,
-                        "data": {
-                            "path": listing.path,
-                            "directories": [{"name": d.name, "size": d.size} for d in listing.directories],
-                            "files": [{"name": f.name, "size": f.size} for f in listing.files]
-                        }
-                    }
-                elif action == "read":
-                    content = get_file_content(path)
-                    return {
-                        "success": True,
-                        "data": {
-                            "path": path,
-                            "content": content[:5000] + "..." if len(content) > 5000 else content  # Limit content size
-                        }
-                    }
-                    
-            elif tool_name == "get_code_template":
-                template = get_code_template(
-                    arguments.get("language", "python"),
-                    arguments.get("template_type", "function")
-                )
-                return {
-                    "success": True,
-                    "data": {
-                        "language": arguments.get("language", "python"),
-                        "template_type": arguments.get("template_type", "function"),
-                        "template": template
-                    }
-                }
-                
-            elif tool_name == "generate_code_prompt":
-                prompt_result = generate_code_prompt(
-                    description=arguments["description"],
-                    language=arguments.get("language", "python"),
-                    style=arguments.get("style", "clean"),
-                    include_tests=arguments.get("include_tests", False),
-                    include_docs=arguments.get("include_docs", True)
-                )
-                return {
-                    "success": True,
-                    "data": {
-                        "prompt": prompt_result.prompt,
-                        "suggestions": prompt_result.suggestions
-                    }
-                }
-            
-            else:
-                return {
-                    "success": False,
-                    "error": f"Unknown tool: {tool_name}"
-                }
-                
+            self._validators[tool_name].validate(arguments)
+        except ValidationError as e:
+            return {
+                "success": False,
+                "error": f"Invalid arguments for {tool_name}: {e.message}"
+            }
+        try:
+            return await handler(arguments)
         except Exception as e:
-            logger.error(f"Error executing tool {tool_name}: {e}")
+            logger.error("Error executing tool %s: %s", tool_name, e)
             return {
                 "success": False,
                 "error": str(e)
             }
+    
+    async def _tool_calculator(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        result = calculate(arguments["expression"])
+        return {
+            "success": True,
+            "data": {
+                "expression": result.expression,
+                "result": result.result,
+                "success": result.success,
+                "error": result.error
+            }
+        }
+    
+    async def _tool_browse_filesystem(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        path = arguments["path"]
+        action = arguments["action"]
+        
+        if action == "list":
+            listing = await asyncio.to_thread(list_directory, path)
+            return {
+                "success": True,
+                "data": {
+                    "path": listing.path,
+                    "directories": [{"name": d.name, "size": d.size} for d in listing.directories],
+                    "files": [{"name": f.name, "size": f.size} for f in listing.files]
+                }
+            }
+        else:  # "read"; the schema's enum rules out any other action
+            # Only the first 5000 characters are sent to the model; reading one more
+            # tells whether the file was longer
+            content = await asyncio.to_thread(get_file_content, path, max_chars=5001)
+            return {
+                "success": True,
+                "data": {
+                    "path": path,
+                    "content": content[:5000] + "..." if len(content) > 5000 else content  # Limit content size
+                }
+            }
+    
+    async def _tool_get_code_template(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        get = arguments.get
+        language = get("language", "python")
+        template_type = get("template_type", "function")
+        return {
+            "success": True,
+            "data": {
+                "language": language,
+                "template_type": template_type,
+                "template": get_code_template(language, template_type)
+            }
+        }
+    
+    async def _tool_generate_code_prompt(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        get = arguments.get
+        prompt, suggestions = _cached_code_prompt(
+            arguments["description"],
+            get("language", "python"),
+            get("style", "clean"),
+            bool(get("include_tests", False)),
+            bool(get("include_docs", True))
+        )
+        return {
+            "success": True,
+            "data": {
+                "prompt": prompt,
+                "suggestions": list(suggestions)
+            }
+        }
 
 class AzureAIMCPClient:
     """Azure AI Foundry client with MCP server integration"""
@@ -253,14 +399,211 @@ class AzureAIMCPClient:
         self.config = config
         self.tool_registry = MCPToolRegistry()
         self.client = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._credential: Optional[ManagedIdentityCredential] = None
+        self._token: Optional[str] = None
+        self._token_exp = 0
         self._setup_client()
+
+    async def __aenter__(self) -> "AzureAIMCPClient":
+        await self._ensure_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        """Create the shared HTTP session on first use and reuse it afterwards"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=60)
+            )
+        return self._session
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
+    async def _bearer_token(self) -> str:
+        """Return the cached managed identity token, refreshing it shortly before expiry"""
+        if self._token is None or time.time() > self._token_exp - 60:
+            token = await asyncio.to_thread(self._credential.get_token, _COGNITIVE_SERVICES_SCOPE)
+            self._token = token.token
+            self._token_exp = token.expires_on
+        return self._token
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        """Authentication header for REST calls: bearer token under managed identity, else api-key"""
+        if self._credential is not None:
+            return {"Authorization": f"Bearer {await self._bearer_token()}"}
+        return {"api-key": self.config.api_key}
+
+    async def _json_headers(self) -> Dict[str, str]:
+        """Headers for JSON REST calls; the prebuilt dict is reused unless a bearer token is needed"""
+        if self._credential is not None:
+            return {**self._base_headers, "Authorization": f"Bearer {await self._bearer_token()}"}
+        return self._base_headers
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> Optional[float]:
+        """Seconds to wait before the next attempt, preferring the server's Retry-After
+        
+        Returns None when the server asks for a longer wait than max_retry_after;
+        retrying any sooner would only be throttled again.
+        """
+        if retry_after:
+            try:
+                delay = max(0.0, float(retry_after))
+            except ValueError:
+                pass  # HTTP-date form; fall back to our own backoff
+            else:
+                return delay if delay <= self.config.max_retry_after else None
+        base = self.config.retry_base_delay
+        return min(self.config.retry_max_delay, base * 2 ** attempt) + random.uniform(0, base)
+
+    @contextlib.asynccontextmanager
+    async def _open_request(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: Optional[bytes] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Send a request and yield the successful response, retrying throttled or
+        transient failures (including connection errors and timeouts) with backoff
+        and jitter; timeout overrides the session's default"""
+        session = await self._ensure_session()
+        # Only pass timeout when given: aiohttp reads timeout=None as "no timeout at all"
+        options = {"timeout": timeout} if timeout is not None else {}
+        attempts = max(1, self.config.retry_attempts)
+        for attempt in range(attempts):
+            try:
+                # Awaited rather than entered, so errors raised while the caller
+                # consumes the yielded response are never mistaken for retryable ones
+                response = await session.request(method, url, headers=headers, data=body, **options)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == attempts - 1:
+                    logger.error("REST API call failed: %s", e or type(e).__name__)
+                    raise
+                failure = str(e) or type(e).__name__
+                delay = self._retry_delay(attempt, None)
+            else:
+                async with response:
+                    if response.status == 200:
+                        yield response
+                        return
+                    error_text = await response.text()
+                    delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                    if (response.status not in _RETRYABLE_STATUSES or attempt == attempts - 1
+                            or delay is None):
+                        logger.error("REST API call failed: %s", error_text)
+                        raise Exception(f"REST API call failed: {error_text}")
+                    failure = response.status
+            logger.warning(
+                "REST API call failed with %s; retrying in %.1fs (attempt %d/%d)",
+                failure, delay, attempt + 1, attempts
+            )
+            await asyncio.sleep(delay)
+
+    async def _post_with_retry(self, url: str, headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        """POST a JSON body with retries and decode the JSON response"""
+        async with self._open_request("POST", url, headers, body) as response:
+            return orjson.loads(await response.read())
+
+    def _chat_request(self, messages: List[Dict[str, Any]], include_tools: bool, stream: bool = False) -> bytes:
+        """Encode a chat completions request body"""
+        data = {
+            "messages": messages,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature
+        }
+        if stream:
+            data["stream"] = True
+            if self._stream_usage:
+                # Ask for a final chunk carrying token usage so the budget can be tracked
+                data["stream_options"] = {"include_usage": True}
+        body = _dumps(data)
+        if include_tools:
+            # Splice in the schema list the registry serialized once up front
+            body = body[:-1] + b',"tools":' + self.tool_registry.tools_json + b'}'
+        return body
+
+    def _check_tool_round(
+        self,
+        content: Optional[str],
+        tool_calls: List[Dict[str, Any]],
+        tokens_used: int,
+        last_tool_request: Optional[bytes]
+    ) -> Tuple[Optional[Dict[str, Any]], bytes]:
+        """Apply the tool loop's cost guards before running a round of tool calls
+        
+        Returns (stop, tool_request): stop holds the response and finish_reason
+        to end the loop with when the token budget is spent or the model repeated
+        its previous tool calls, and is None otherwise; tool_request identifies
+        this round for the next round's repeat check.
+        """
+        if self.config.token_budget is not None and tokens_used > self.config.token_budget:
+            return {
+                "response": content or "Token budget exhausted.",
+                "finish_reason": "token_budget_exceeded"
+            }, None
+        # Asking for the same calls again would just repeat the last round
+        tool_request = _dumps([content, [tc["function"] for tc in tool_calls]])
+        if tool_request == last_tool_request:
+            return {
+                "response": content or "Stopped: the model repeated its last tool calls.",
+                "finish_reason": "no_progress"
+            }, tool_request
+        return None, tool_request
+
+    def _start_tool_call(self, tool_call: Dict[str, Any]) -> Tuple[str, Dict[str, Any], "asyncio.Task[Dict[str, Any]]"]:
+        """Decode a tool call's arguments and start executing it in the background"""
+        tool_name = tool_call["function"]["name"]
+        tool_args = orjson.loads(tool_call["function"]["arguments"])
+        logger.info("Executing tool: %s with args: %s", tool_name, tool_args)
+        task = asyncio.ensure_future(self.tool_registry.execute_tool(tool_name, tool_args))
+        return tool_name, tool_args, task
+
+    async def _finish_tool_calls(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        started: List[Tuple[str, Dict[str, Any], "asyncio.Task[Dict[str, Any]]"]],
+        tool_call_history: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Wait for started tool calls and turn their results into 'tool' messages"""
+        # gather keeps request order, so each result lines up with its tool_call_id
+        results = await asyncio.gather(*(task for _, _, task in started), return_exceptions=True)
+        tool_messages = []
+        for tool_call, (tool_name, tool_args, _), tool_result in zip(tool_calls, started, results):
+            if isinstance(tool_result, BaseException):
+                tool_result = {"success": False, "error": str(tool_result)}
+            tool_call_history.append({
+                "tool": tool_name,
+                "arguments": tool_args,
+                "result": tool_result
+            })
+            tool_messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": _dumps(tool_result).decode()
+            })
+        return tool_messages
+
     def _setup_client(self):
         """Initialize Azure AI client with proper authentication"""
         try:
-            if self.config.use_managed_identity:
-                # Use Managed Identity for Azure-hosted environments
-                credential = DefaultAzureCredential()
+            use_managed_identity = self.config.use_managed_identity
+            if use_managed_identity is None:
+                use_managed_identity = not self.config.api_key
+            
+            if use_managed_identity:
+                # Use Managed Identity directly; DefaultAzureCredential would probe
+                # every credential source in turn before reaching it
+                credential = ManagedIdentityCredential(client_id=os.getenv("AZURE_CLIENT_ID"))
+                self._credential = credential
                 logger.info("Using Managed Identity for authentication")
             elif self.config.api_key:
                 # Use API key for development/testing
@@ -289,11 +632,22 @@ class AzureAIMCPClient:
                     credential=credential
                 )
             
-            logger.info(f"Connected to Azure AI endpoint: {endpoint}")
-            logger.info(f"Using API version: {getattr(self.config, 'api_version', 'default')}")
+            # The REST URL and static headers never change for this client, so build them once
+            self._chat_url = (
+                f"{self.config.endpoint.rstrip('/')}/openai/deployments/{self.config.deployment_name}"
+                f"/chat/completions?api-version={self.config.api_version}"
+            )
+            self._base_headers = {"Content-Type": "application/json"}
+            # api-versions are dated (YYYY-MM-DD[-preview]), so they compare as strings
+            self._stream_usage = self.config.api_version[:10] >= _STREAM_USAGE_API_VERSION
+            if self._credential is None:
+                self._base_headers["api-key"] = self.config.api_key
+            
+            logger.info("Connected to Azure AI endpoint: %s", endpoint)
+            logger.info("Using API version: %s", self.config.api_version)
             
         except Exception as e:
-            logger.error(f"Failed to initialize Azure AI client: {e}")
+            logger.error("Failed to initialize Azure AI client: %s", e)
             raise
     
     async def chat_with_tools(self, messages: List[Dict[str, str]], max_tool_calls: int = 5) -> Dict[str, Any]:
@@ -313,52 +667,34 @@ class AzureAIMCPClient:
                 rest_messages.append({"role": msg["role"], "content": msg["content"]})
 
             tool_call_history = []
+            tokens_used = 0
+            last_tool_request = None
             for iteration in range(max_tool_calls):
                 # On the first request, include tool definitions
                 include_tools = (iteration == 0)
-                url = f"{self.config.endpoint.rstrip('/')}/openai/deployments/{self.config.deployment_name}/chat/completions?api-version={self.config.api_version}"
-                headers = {
-                    "api-key": self.config.api_key,
-                    "Content-Type": "application/json"
-                }
-                data = {
-                    "messages": rest_messages,
-                    "max_tokens": self.config.max_tokens,
-                    "temperature": self.config.temperature
-                }
-                if include_tools:
-                    data["tools"] = list(self.tool_registry.tools.values())
-                response = requests.post(url, headers=headers, data=json.dumps(data))
-                if response.status_code != 200:
-                    logger.error(f"REST API call failed: {response.text}")
-                    raise Exception(f"REST API call failed: {response.text}")
-                result = response.json()
+                headers = await self._json_headers()
+                body = self._chat_request(rest_messages, include_tools)
+                result = await self._post_with_retry(self._chat_url, headers, body)
                 choice = result["choices"][0]
                 message = choice["message"]
+                tokens_used += result.get("usage", {}).get("total_tokens", 0)
                 # Check for tool calls
                 if "tool_calls" in message and message["tool_calls"]:
-                    tool_messages = []
-                    for tool_call in message["tool_calls"]:
-                        tool_name = tool_call["function"]["name"]
-                        tool_args = json.loads(tool_call["function"]["arguments"])
-                        logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-                        tool_result = await self.tool_registry.execute_tool(tool_name, tool_args)
-                        tool_call_history.append({
-                            "tool": tool_name,
-                            "arguments": tool_args,
-                            "result": tool_result
-                        })
-                        # Add tool result to conversation as a 'tool' message
-                        tool_messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call["id"],
-                            "content": json.dumps(tool_result)
-                        })
+                    stop, last_tool_request = self._check_tool_round(
+                        message.get("content"), message["tool_calls"], tokens_used, last_tool_request
+                    )
+                    if stop is not None:
+                        return {**stop, "tool_calls": tool_call_history, "total_tokens": tokens_used}
+                    # Independent tool calls run concurrently
+                    started = [self._start_tool_call(tc) for tc in message["tool_calls"]]
+                    tool_messages = await self._finish_tool_calls(message["tool_calls"], started, tool_call_history)
                     # Append the assistant's tool_call message and the tool response(s)
                     rest_messages.append({
                         k: v for k, v in message.items() if k in ("role", "content", "tool_calls")
                     })
                     rest_messages.extend(tool_messages)
+                    if self.config.history_window is not None:
+                        rest_messages = _compact_history(rest_messages, self.config.history_window)
                     # Next request: do NOT include 'tools' field
                     continue
                 else:
@@ -367,18 +703,228 @@ class AzureAIMCPClient:
                         "response": message["content"],
                         "tool_calls": tool_call_history,
                         "finish_reason": choice["finish_reason"],
-                        "total_tokens": result["usage"]["total_tokens"] if "usage" in result else None
+                        "total_tokens": tokens_used
                     }
             return {
                 "response": "Maximum tool calls reached.",
                 "tool_calls": tool_call_history,
                 "finish_reason": "max_tool_calls",
-                "total_tokens": None
+                "total_tokens": tokens_used
             }
         except Exception as e:
-            logger.error(f"Error in chat_with_tools (REST tool-calling): {e}")
+            logger.error("Error in chat_with_tools (REST tool-calling): %s", e)
             raise
 
+    async def chat_with_tools_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tool_calls: int = 5
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of chat_with_tools using server-sent events
+        
+        Content is yielded as it arrives, and each tool call starts executing
+        as soon as its arguments are complete rather than after the whole
+        response has been received.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            max_tool_calls: Maximum number of tool calls allowed in a conversation
+            
+        Yields:
+            {"type": "content", "content": ...} for each piece of response text,
+            {"type": "tool_call", ...} for each finished tool call, and finally
+            {"type": "done", ...} with the same fields chat_with_tools returns
+        """
+        rest_messages = [{"role": msg["role"], "content": msg["content"]} for msg in messages]
+        tool_call_history: List[Dict[str, Any]] = []
+        tokens_used = 0
+        last_tool_request = None
+        for iteration in range(max_tool_calls):
+            headers = await self._json_headers()
+            body = self._chat_request(rest_messages, include_tools=(iteration == 0), stream=True)
+            content_parts: List[str] = []
+            tool_calls: List[Dict[str, Any]] = []
+            started = []
+            finish_reason = None
+            async with self._open_request(
+                "POST", self._chat_url, headers, body, timeout=_STREAM_TIMEOUT
+            ) as response:
+                async for line in response.content:
+                    if not line.startswith(b"data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == b"[DONE]":
+                        break
+                    chunk = orjson.loads(payload)
+                    if chunk.get("usage"):
+                        tokens_used += chunk["usage"].get("total_tokens", 0)
+                    if not chunk.get("choices"):
+                        continue
+                    choice = chunk["choices"][0]
+                    delta = choice.get("delta") or {}
+                    if delta.get("content"):
+                        content_parts.append(delta["content"])
+                        yield {"type": "content", "content": delta["content"]}
+                    for fragment in delta.get("tool_calls") or ():
+                        index = fragment["index"]
+                        if index == len(tool_calls):
+                            # A new call begins, so the previous one's arguments are complete
+                            if tool_calls:
+                                started.append(self._start_tool_call(tool_calls[-1]))
+                            tool_calls.append({
+                                "id": fragment.get("id"),
+                                "type": "function",
+                                "function": {"name": "", "arguments": ""}
+                            })
+                        function = fragment.get("function") or {}
+                        tool_calls[index]["function"]["name"] += function.get("name") or ""
+                        tool_calls[index]["function"]["arguments"] += function.get("arguments") or ""
+                    finish_reason = choice.get("finish_reason") or finish_reason
+            
+            # Usage is only reported when the api_version supports stream_options
+            total_tokens = tokens_used if self._stream_usage else None
+            if not tool_calls:
+                yield {
+                    "type": "done",
+                    "response": "".join(content_parts),
+                    "tool_calls": tool_call_history,
+                    "finish_reason": finish_reason,
+                    "total_tokens": total_tokens
+                }
+                return
+            
+            stop, last_tool_request = self._check_tool_round(
+                "".join(content_parts) or None, tool_calls, tokens_used, last_tool_request
+            )
+            if stop is not None:
+                # Calls already started while streaming are abandoned
+                for _, _, task in started:
+                    task.cancel()
+                yield {"type": "done", **stop, "tool_calls": tool_call_history, "total_tokens": total_tokens}
+                return
+            
+            started.append(self._start_tool_call(tool_calls[-1]))
+            history_start = len(tool_call_history)
+            tool_messages = await self._finish_tool_calls(tool_calls, started, tool_call_history)
+            for entry in tool_call_history[history_start:]:
+                yield {"type": "tool_call", **entry}
+            rest_messages.append({
+                "role": "assistant",
+                "content": "".join(content_parts) or None,
+                "tool_calls": tool_calls
+            })
+            rest_messages.extend(tool_messages)
+            if self.config.history_window is not None:
+                rest_messages = _compact_history(rest_messages, self.config.history_window)
+        yield {
+            "type": "done",
+            "response": "Maximum tool calls reached.",
+            "tool_calls": tool_call_history,
+            "finish_reason": "max_tool_calls",
+            "total_tokens": tokens_used if self._stream_usage else None
+        }
+
+    async def chat_batch(
+        self,
+        conversations: List[List[Dict[str, str]]],
+        poll_interval: float = 30.0
+    ) -> List[Dict[str, Any]]:
+        """
+        Run many independent chats through the Azure OpenAI Batch API
+        
+        Batch jobs trade turnaround time (up to a 24h completion window) for
+        throughput and cost, so this suits offline work such as evaluations.
+        Each conversation gets a single completion: tools are not offered since
+        the tool-calling loop cannot run inside a batch. Requires a Global Batch
+        deployment and an api_version that supports batches.
+        
+        Args:
+            conversations: One list of message dictionaries per chat
+            poll_interval: Seconds to wait between batch status checks
+            
+        Returns:
+            One dictionary per conversation, in input order, with the response,
+            finish reason, token usage and any per-request error
+        """
+        session = await self._ensure_session()
+        base_url = f"{self.config.endpoint.rstrip('/')}/openai"
+        query = f"?api-version={self.config.api_version}"
+        
+        lines = [
+            _dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": self.config.deployment_name,
+                    "messages": [{"role": msg["role"], "content": msg["content"]} for msg in conversation],
+                    "max_tokens": self.config.max_tokens,
+                    "temperature": self.config.temperature
+                }
+            })
+            for index, conversation in enumerate(conversations)
+        ]
+        form = aiohttp.FormData()
+        form.add_field("purpose", "batch")
+        form.add_field("file", b"\n".join(lines), filename="batch.jsonl", content_type="application/jsonl")
+        async with session.post(f"{base_url}/files{query}", headers=await self._auth_headers(), data=form) as response:
+            input_file = await _read_json_response(response)
+        
+        batch_request = {
+            "input_file_id": input_file["id"],
+            "endpoint": "/chat/completions",
+            "completion_window": "24h"
+        }
+        async with session.post(
+            f"{base_url}/batches{query}",
+            headers=await self._json_headers(),
+            data=_dumps(batch_request)
+        ) as response:
+            batch = await _read_json_response(response)
+        logger.info("Submitted batch %s with %d request(s)", batch["id"], len(lines))
+        
+        while batch["status"] not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            # Fetch headers per request: a managed identity token can expire mid-batch
+            async with self._open_request(
+                "GET", f"{base_url}/batches/{batch['id']}{query}", await self._auth_headers()
+            ) as response:
+                batch = orjson.loads(await response.read())
+        if batch["status"] != "completed":
+            raise Exception(f"Batch {batch['id']} ended with status: {batch['status']}")
+        
+        results: List[Dict[str, Any]] = [
+            {"response": None, "finish_reason": None, "total_tokens": None, "error": "No result returned"}
+            for _ in conversations
+        ]
+        # Successful requests land in the output file, failed ones in the error file
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            if not file_id:
+                continue
+            async with self._open_request(
+                "GET", f"{base_url}/files/{file_id}/content{query}", await self._auth_headers()
+            ) as response:
+                output = await response.read()
+            for line in output.splitlines():
+                if not line.strip():
+                    continue
+                item = orjson.loads(line)
+                reply = item.get("response") or {}
+                body = reply.get("body") or {}
+                if item.get("error") or reply.get("status_code") != 200:
+                    error = item.get("error") or body.get("error")
+                    results[int(item["custom_id"])]["error"] = error
+                    continue
+                choice = body["choices"][0]
+                results[int(item["custom_id"])] = {
+                    "response": choice["message"]["content"],
+                    "finish_reason": choice["finish_reason"],
+                    "total_tokens": body.get("usage", {}).get("total_tokens"),
+                    "error": None
+                }
+        return results
+
 async def example_azure_ai_conversation():
     """Example conversation using Azure AI with MCP tools"""
     # Configuration - replace with your Azure AI Foundry details
@@ -396,19 +942,11 @@ async def example_azure_ai_conversation():
     print(f"  API version:     {api_version}")
     print(f"  API key present: {'Yes' if api_key else 'No'}")
 
-    # Print .env contents except API key
-    try:
-        dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
-        if os.path.exists(dotenv_path):
-            print("\n[.env file contents (excluding API key)]:")
-            with open(dotenv_path, 'r') as f:
-                for line in f:
-                    if 'API_KEY' in line:
-                        print('AZURE_AI_API_KEY=***hidden***')
-                    else:
-                        print(line.rstrip())
-    except Exception as e:
-        print(f"[Warning] Could not read .env file: {e}")
+    # Print Azure AI settings except the API key; .env was already loaded into os.environ
+    print("\n[Azure AI environment variables (excluding API key)]:")
+    for key, value in sorted(os.environ.items()):
+        if key.startswith("AZURE_AI_"):
+            print(f"{key}={'***hidden***' if 'API_KEY' in key else value}")
 
     # Always require deployment_name, never prompt for it
     if not deployment_name:
@@ -430,41 +968,40 @@ async def example_azure_ai_conversation():
     
     try:
         # Create client
-        ai_client = AzureAIMCPClient(config)
+        async with AzureAIMCPClient(config) as ai_client:
+            print("🚀 Azure AI Foundry + MCP Server Integration Demo")
+            print("=" * 50)
         
-        print("🚀 Azure AI Foundry + MCP Server Integration Demo")
-        print("=" * 50)
-        
-        # Example conversation
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a helpful AI assistant with access to calculator, filesystem, and code generation tools. Use these tools when appropriate to help users."
-            },
-            {
-                "role": "user",
-                "content": "Can you calculate the square root of 144, then list the files in my current directory, and finally generate a Python function template?"
-            }
-        ]
+            # Example conversation
+            messages = [
+                {
+                    "role": "system",
+                    "content": "You are a helpful AI assistant with access to calculator, filesystem, and code generation tools. Use these tools when appropriate to help users."
+                },
+                {
+                    "role": "user",
+                    "content": "Can you calculate the square root of 144, then list the files in my current directory, and finally generate a Python function template?"
+                }
+            ]
         
-        print("🤖 User:", messages[-1]["content"])
-        print("\n🔄 Processing with Azure AI model...")
+            print("🤖 User:", messages[-1]["content"])
+            print("\n🔄 Processing with Azure AI model...")
         
-        result = await ai_client.chat_with_tools(messages)
+            result = await ai_client.chat_with_tools(messages)
         
-        print(f"\n✅ AI Response:")
-        print(result["response"])
+            print(f"\n✅ AI Response:")
+            print(result["response"])
         
-        print(f"\n📊 Tool Calls Made ({len(result['tool_calls'])}):")
-        for i, tool_call in enumerate(result["tool_calls"], 1):
-            print(f"  {i}. {tool_call['tool']}: {tool_call['arguments']}")
-            if tool_call['result']['success']:
-                print(f"     ✅ Success: {str(tool_call['result']['data'])[:100]}...")
-            else:
-                print(f"     ❌ Error: {tool_call['result']['error']}")
+            print(f"\n📊 Tool Calls Made ({len(result['tool_calls'])}):")
+            for i, tool_call in enumerate(result["tool_calls"], 1):
+                print(f"  {i}. {tool_call['tool']}: {tool_call['arguments']}")
+                if tool_call['result']['success']:
+                    print(f"     ✅ Success: {str(tool_call['result']['data'])[:100]}...")
+                else:
+                    print(f"     ❌ Error: {tool_call['result']['error']}")
         
-        if result.get("total_tokens"):
-            print(f"\n📈 Tokens used: {result['total_tokens']}")
+            if result.get("total_tokens"):
+                print(f"\n📈 Tokens used: {result['total_tokens']}")
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -482,58 +1019,97 @@ async def interactive_chat():
     )
     
     try:
-        ai_client = AzureAIMCPClient(config)
-        
-        print("\n🎉 Azure AI + MCP Chat Session Started!")
-        print("Available tools: calculator, browse_filesystem, get_code_template, generate_code_prompt")
-        print("Type 'quit' to exit\n")
-        
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a helpful AI assistant with access to calculator, filesystem browsing, and code generation tools. Use these tools when appropriate to help users. Be concise but thorough in your responses."
-            }
-        ]
-        
-        while True:
-            user_input = input("You: ").strip()
-            
-            if user_input.lower() in ['quit', 'exit', 'bye']:
-                print("👋 Goodbye!")
-                break
-                
-            if not user_input:
-                continue
+        async with AzureAIMCPClient(config) as ai_client:
+            print("\n🎉 Azure AI + MCP Chat Session Started!")
+            print("Available tools: calculator, browse_filesystem, get_code_template, generate_code_prompt")
+            print("Type 'quit' to exit\n")
             
-            messages.append({"role": "user", "content": user_input})
-            
-            print("🤖 Assistant: ", end="", flush=True)
+            messages = [
+                {
+                    "role": "system",
+                    "content": "You are a helpful AI assistant with access to calculator, filesystem browsing, and code generation tools. Use these tools when appropriate to help users. Be concise but thorough in your responses."
+                }
+            ]
             
-            try:
-                result = await ai_client.chat_with_tools(messages)
-                print(result["response"])
+            while True:
+                user_input = input("You: ").strip()
                 
-                messages.append({"role": "assistant", "content": result["response"]})
-                
-                if result["tool_calls"]:
-                    print(f"🔧 Used {len(result['tool_calls'])} tool(s)")
+                if user_input.lower() in ['quit', 'exit', 'bye']:
+                    print("👋 Goodbye!")
+                    break
                     
-            except Exception as e:
-                print(f"❌ Error: {e}")
+                if not user_input:
+                    continue
                 
+                messages.append({"role": "user", "content": user_input})
+                
+                print("🤖 Assistant: ", end="", flush=True)
+                
+                try:
+                    # Print the reply as it streams in
+                    streamed = False
+                    async for event in ai_client.chat_with_tools_stream(messages):
+                        if event["type"] == "content":
+                            print(event["content"], end="", flush=True)
+                            streamed = True
+                        elif event["type"] == "done":
+                            result = event
+                    print("" if streamed else result["response"])
+                    
+                    messages.append({"role": "assistant", "content": result["response"]})
+                    
+                    if result["tool_calls"]:
+                        print(f"🔧 Used {len(result['tool_calls'])} tool(s)")
+                        
+                except Exception as e:
+                    print(f"❌ Error: {e}")
+                    
     except Exception as e:
         print(f"❌ Setup error: {e}")
 
+def _run_profiled(mode: str, profiler: str):
+    """Run a mode under a profiler to find where time actually goes"""
+    if profiler == "py-spy":
+        import shutil
+        import subprocess
+        if shutil.which("py-spy") is None:
+            print("❌ py-spy not found. Install it with: pip install py-spy")
+            return
+        # py-spy samples a separate process, so re-run this script unprofiled under it
+        subprocess.run(
+            ["py-spy", "record", "-o", "profile.svg", "--", sys.executable, __file__, "--mode", mode],
+            check=False
+        )
+        print("🔥 Flamegraph written to profile.svg")
+        return
+    
+    import cProfile
+    import pstats
+    
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        asyncio.run(example_azure_ai_conversation() if mode == "demo" else interactive_chat())
+    finally:
+        profile.disable()
+        profile.dump_stats("profile.prof")
+        print("\n📈 Top 10 functions by cumulative time (full profile in profile.prof):")
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(10)
+
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Azure AI Foundry + MCP Server Integration")
     parser.add_argument("--mode", choices=["demo", "chat"], default="demo",
                        help="Run mode: demo for example conversation, chat for interactive session")
+    parser.add_argument("--profile", choices=["cprofile", "py-spy"],
+                       help="Profile the run: cprofile writes profile.prof, py-spy writes a profile.svg flamegraph")
     
     args = parser.parse_args()
     
-    if args.mode == "demo":
+    if args.profile:
+        _run_profiled(args.mode, args.profile)
+    elif args.mode == "demo":
         asyncio.run(example_azure_ai_conversation())
     else:
         asyncio.run(interactive_chat())
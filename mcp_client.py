@@ -4,24 +4,68 @@ MCP Client to connect AI models to hjmcpsse server
 """
 
 import asyncio
-import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+# Sessions parked by keep_alive clients on disconnect(), keyed on server_path.
+# Each entry is (client_context, read, write, session) and is bound to the
+# event loop and task that opened it, so close_pooled_clients() must run in that
+# task before the loop shuts down; otherwise anyio fails the loop teardown with
+# "Attempted to exit cancel scope in a different task".
+_CLIENT_POOL: Dict[str, Tuple[Any, Any, Any, ClientSession]] = {}
+
+
+async def close_pooled_clients():
+    """Shut down every parked server subprocess
+    
+    Call this from the task that opened the sessions, before its event loop
+    shuts down (e.g. in the finally block of the coroutine passed to asyncio.run).
+    """
+    while _CLIENT_POOL:
+        _, (client_context, _read, _write, session) = _CLIENT_POOL.popitem()
+        await session.__aexit__(None, None, None)
+        await client_context.__aexit__(None, None, None)
+
 class HjmcpsseClient:
     """Client to interact with hjmcpsse MCP server"""
     
-    def __init__(self, server_path: str = None):
+    def __init__(
+        self,
+        server_path: str = None,
+        list_cache_ttl: Optional[float] = None,
+        keep_alive: bool = False
+    ):
         """Initialize the MCP client
         
         Args:
             server_path: Path to the hjmcpsse server directory
+            list_cache_ttl: Seconds to reuse list_tools/list_resources/list_prompts
+                results (None caches them until refresh() or reconnect)
+            keep_alive: Keep the server subprocess running after disconnect() so the
+                next connect() for the same server_path reuses it instead of
+                starting a new interpreter; parked subprocesses must be closed with
+                close_pooled_clients() before the event loop shuts down
         """
         self.server_path = server_path or "C:/CDrive/Workshops/CustomAI/mcpsse/hjmcpsse/src"
         self.session = None
+        self.client_context = None
+        self.read = None
+        self.write = None
+        self.list_cache_ttl = list_cache_ttl
+        self.keep_alive = keep_alive
+        self._list_cache: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._list_locks: Dict[str, asyncio.Lock] = {}
         
     async def connect(self):
         """Connect to the MCP server"""
+        pooled = _CLIENT_POOL.pop(self.server_path, None) if self.keep_alive else None
+        if pooled is not None:
+            self.client_context, self.read, self.write, self.session = pooled
+            self.refresh()
+            return
+        
         server_params = StdioServerParameters(
             command="python",
             args=["-m", "hjmcpsse"],
@@ -33,31 +77,53 @@ class HjmcpsseClient:
         self.session = ClientSession(self.read, self.write)
         await self.session.__aenter__()
         await self.session.initialize()
+        self.refresh()
         
     async def disconnect(self):
-        """Disconnect from the MCP server"""
-        if self.session:
-            await self.session.__aexit__(None, None, None)
-        if hasattr(self, 'client_context'):
-            await self.client_context.__aexit__(None, None, None)
+        """Disconnect from the MCP server (calling it again is a no-op)"""
+        session, client_context, read, write = self.session, self.client_context, self.read, self.write
+        # Forget the connection first so a repeated disconnect() never exits it twice
+        self.session = self.client_context = self.read = self.write = None
+        
+        if self.keep_alive and session and client_context and self.server_path not in _CLIENT_POOL:
+            # Park the initialized session; the subprocess stays warm for the next connect()
+            _CLIENT_POOL[self.server_path] = (client_context, read, write, session)
+            return
+        if session:
+            await session.__aexit__(None, None, None)
+        if client_context:
+            await client_context.__aexit__(None, None, None)
     
-    async def list_tools(self):
-        """Get available tools"""
+    def refresh(self):
+        """Forget cached tool/resource/prompt listings so the next call re-fetches them"""
+        self._list_cache.clear()
+    
+    async def _cached_list(self, key: str, fetch: Callable[[], Awaitable[Any]]):
+        """Return a cached listing, fetching it from the server when missing or expired"""
         if not self.session:
             raise RuntimeError("Not connected to server")
-        return await self.session.list_tools()
+        # One lock per listing so concurrent first calls share a single round-trip
+        lock = self._list_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = self._list_cache.get(key)
+            if cached is not None and (cached[1] is None or time.monotonic() < cached[1]):
+                return cached[0]
+            result = await fetch()
+            expiry = None if self.list_cache_ttl is None else time.monotonic() + self.list_cache_ttl
+            self._list_cache[key] = (result, expiry)
+            return result
+    
+    async def list_tools(self):
+        """Get available tools"""
+        return await self._cached_list("tools", lambda: self.session.list_tools())
     
     async def list_resources(self):
         """Get available resources"""
-        if not self.session:
-            raise RuntimeError("Not connected to server")
-        return await self.session.list_resources()
+        return await self._cached_list("resources", lambda: self.session.list_resources())
     
     async def list_prompts(self):
         """Get available prompts"""
-        if not self.session:
-            raise RuntimeError("Not connected to server")
-        return await self.session.list_prompts()
+        return await self._cached_list("prompts", lambda: self.session.list_prompts())
     
     async def call_tool(self, tool_name: str, arguments: dict):
         """Call a tool with arguments"""
@@ -65,6 +131,22 @@ class HjmcpsseClient:
             raise RuntimeError("Not connected to server")
         return await self.session.call_tool(tool_name, arguments)
     
+    async def call_tools_batch(self, calls: List[Tuple[str, dict]]):
+        """Call several tools at once, returning their results in the same order
+        
+        MCP sessions do not accept JSON-RPC batch arrays, so the requests are
+        pipelined instead: all are sent without waiting for earlier replies,
+        and the session matches responses back by request id.
+        
+        Args:
+            calls: (tool_name, arguments) pairs
+        """
+        if not self.session:
+            raise RuntimeError("Not connected to server")
+        return await asyncio.gather(
+            *(self.session.call_tool(tool_name, arguments) for tool_name, arguments in calls)
+        )
+    
     async def get_resource(self, uri: str):
         """Get a resource by URI"""
         if not self.session:
@@ -124,36 +206,30 @@ async def example_ai_interaction():
         await client.connect()
         print("✅ Connected to hjmcpsse MCP server")
         
-        # List available capabilities
-        tools = await client.list_tools()
+        # List available capabilities (independent, so request them concurrently)
+        tools, resources, prompts = await asyncio.gather(
+            client.list_tools(),
+            client.list_resources(),
+            client.list_prompts()
+        )
         print(f"\n📋 Available tools: {[tool.name for tool in tools.tools]}")
-        
-        resources = await client.list_resources()
         print(f"📁 Available resources: {len(resources.resources)} resource types")
-        
-        prompts = await client.list_prompts()
         print(f"💬 Available prompts: {[prompt.name for prompt in prompts.prompts]}")
         
         # Simulate AI model using tools
         print("\n🤖 AI Model using MCP tools:")
         print("=" * 40)
         
-        # Use calculator
-        calc_result = await ai_interface.calculate("sqrt(144) + 5 * 3")
+        # None of these depend on each other, so run them concurrently
+        calc_result, dir_result, template_result, prompt_result = await asyncio.gather(
+            ai_interface.calculate("sqrt(144) + 5 * 3"),
+            ai_interface.browse_directory("/c/CDrive/Workshops/CustomAI/mcpsse"),
+            ai_interface.get_code_template("python", "function"),
+            ai_interface.generate_code_prompt("Create a function to validate email addresses")
+        )
         print(f"🧮 Math calculation: {calc_result}")
-        
-        # Browse directory
-        dir_result = await ai_interface.browse_directory("/c/CDrive/Workshops/CustomAI/mcpsse")
         print(f"📁 Directory contents: {dir_result[:100]}...")
-        
-        # Get code template
-        template_result = await ai_interface.get_code_template("python", "function")
         print(f"📝 Code template: {template_result}")
-        
-        # Generate code prompt
-        prompt_result = await ai_interface.generate_code_prompt(
-            "Create a function to validate email addresses"
-        )
         print(f"💡 Generated prompt: {prompt_result[:100]}...")
         
     except Exception as e:
@@ -4,15 +4,99 @@ Code generation prompts for MCP server
 
 from typing import List, Optional
 from dataclasses import dataclass
+from functools import lru_cache
 
 
-@dataclass
+@dataclass(slots=True)
 class CodePromptData:
     """Data structure for code generation prompts"""
     prompt: str
     suggestions: List[str]
     language: str
     style: str
+    suggestions_text: str = ""
+
+
+# Prompt fragments, keyed by lowercased language (and style where it matters)
+_LANGUAGE_NAMES = {
+    "python": "Python",
+    "javascript": "JavaScript",
+    "typescript": "TypeScript",
+}
+
+_STYLE_FRAGMENTS = {
+    ("python", "functional"): "Use a functional programming approach with pure functions.",
+    ("python", "object-oriented"): "Use object-oriented design with appropriate classes and methods.",
+    ("javascript", "functional"): "Use functional programming patterns with arrow functions and immutable data.",
+    ("javascript", "object-oriented"): "Use ES6+ classes and modern JavaScript features.",
+}
+
+_DEFAULT_STYLE_FRAGMENTS = {
+    "python": "Write clean, readable code following Python best practices.",
+    "javascript": "Write clean, modern JavaScript following best practices.",
+    "typescript": "Include proper type annotations and interfaces.",
+}
+
+_DOC_FRAGMENTS = {
+    "python": "Include comprehensive docstrings for all functions and classes.",
+    "javascript": "Include JSDoc comments for all functions and classes.",
+    "typescript": "Include JSDoc comments for all functions and classes.",
+}
+_DEFAULT_DOC_FRAGMENT = "Include appropriate documentation comments."
+
+_TEST_FRAGMENTS = {
+    "python": "Include unit tests using pytest or unittest.",
+    "javascript": "Include unit tests using Jest or similar testing framework.",
+    "typescript": "Include unit tests using Jest or similar testing framework.",
+}
+_DEFAULT_TEST_FRAGMENT = "Include appropriate unit tests."
+
+_PROMPT_TRAILER = (
+    "Ensure proper error handling and edge case management.",
+    "Follow naming conventions and code organization best practices.",
+    "Make the code maintainable and extensible.",
+)
+
+# (keywords matched against the lowercased description, suggestions they add)
+_KEYWORD_SUGGESTIONS = (
+    (("function",), (
+        "Consider breaking complex logic into smaller helper functions",
+        "Add input validation and type checking",
+    )),
+    (("class",), (
+        "Follow SOLID principles for class design",
+        "Consider using composition over inheritance where appropriate",
+    )),
+    (("api", "endpoint"), (
+        "Include proper HTTP status codes and error responses",
+        "Add request validation and sanitization",
+    )),
+    (("data", "database"), (
+        "Consider data validation and sanitization",
+        "Implement proper error handling for data operations",
+    )),
+)
+
+_TEST_SUGGESTIONS = (
+    "Test both happy path and error scenarios",
+    "Consider edge cases and boundary conditions",
+)
+
+_JS_SUGGESTIONS = (
+    "Use const/let instead of var",
+    "Consider using async/await for asynchronous operations",
+    "Use destructuring and spread operators where appropriate",
+)
+
+_LANGUAGE_SUGGESTIONS = {
+    "python": (
+        "Use type hints for better code documentation",
+        "Consider using dataclasses or Pydantic for data structures",
+        "Follow PEP 8 style guidelines",
+    ),
+    "javascript": _JS_SUGGESTIONS,
+    "typescript": _JS_SUGGESTIONS,
+}
 
 
 def generate_code_prompt(
@@ -34,87 +118,33 @@ def generate_code_prompt(
     Returns:
         CodePromptData with the generated prompt and suggestions
     """
+    lang = language.lower()
+    desc = description.lower()
+    
+    prompt_parts = [f"Write {_LANGUAGE_NAMES.get(lang, language)} code that {description}."]
     
-    prompt_parts = []
-    
-    if language.lower() == "python":
-        prompt_parts.append(f"Write Python code that {description}.")
-        if style == "functional":
-            prompt_parts.append("Use a functional programming approach with pure functions.")
-        elif style == "object-oriented":
-            prompt_parts.append("Use object-oriented design with appropriate classes and methods.")
-        else:
-            prompt_parts.append("Write clean, readable code following Python best practices.")
-    elif language.lower() == "javascript":
-        prompt_parts.append(f"Write JavaScript code that {description}.")
-        if style == "functional":
-            prompt_parts.append("Use functional programming patterns with arrow functions and immutable data.")
-        elif style == "object-oriented":
-            prompt_parts.append("Use ES6+ classes and modern JavaScript features.")
-        else:
-            prompt_parts.append("Write clean, modern JavaScript following best practices.")
-    elif language.lower() == "typescript":
-        prompt_parts.append(f"Write TypeScript code that {description}.")
-        prompt_parts.append("Include proper type annotations and interfaces.")
-    else:
-        prompt_parts.append(f"Write {language} code that {description}.")
+    style_fragment = _STYLE_FRAGMENTS.get((lang, style.lower())) or _DEFAULT_STYLE_FRAGMENTS.get(lang)
+    if style_fragment:
+        prompt_parts.append(style_fragment)
     
     if include_docs:
-        if language.lower() == "python":
-            prompt_parts.append("Include comprehensive docstrings for all functions and classes.")
-        elif language.lower() in ["javascript", "typescript"]:
-            prompt_parts.append("Include JSDoc comments for all functions and classes.")
-        else:
-            prompt_parts.append("Include appropriate documentation comments.")
+        prompt_parts.append(_DOC_FRAGMENTS.get(lang, _DEFAULT_DOC_FRAGMENT))
     
     if include_tests:
-        if language.lower() == "python":
-            prompt_parts.append("Include unit tests using pytest or unittest.")
-        elif language.lower() in ["javascript", "typescript"]:
-            prompt_parts.append("Include unit tests using Jest or similar testing framework.")
-        else:
-            prompt_parts.append("Include appropriate unit tests.")
-    
-    prompt_parts.extend([
-        "Ensure proper error handling and edge case management.",
-        "Follow naming conventions and code organization best practices.",
-        "Make the code maintainable and extensible."
-    ])
+        prompt_parts.append(_TEST_FRAGMENTS.get(lang, _DEFAULT_TEST_FRAGMENT))
     
-    suggestions = []
-    
-    if "function" in description.lower():
-        suggestions.append("Consider breaking complex logic into smaller helper functions")
-        suggestions.append("Add input validation and type checking")
-    
-    if "class" in description.lower():
-        suggestions.append("Follow SOLID principles for class design")
-        suggestions.append("Consider using composition over inheritance where appropriate")
+    prompt_parts.extend(_PROMPT_TRAILER)
     
-    if "api" in description.lower() or "endpoint" in description.lower():
-        suggestions.append("Include proper HTTP status codes and error responses")
-        suggestions.append("Add request validation and sanitization")
+    suggestions = []
     
-    if "data" in description.lower() or "database" in description.lower():
-        suggestions.append("Consider data validation and sanitization")
-        suggestions.append("Implement proper error handling for data operations")
+    for keywords, keyword_suggestions in _KEYWORD_SUGGESTIONS:
+        if any(keyword in desc for keyword in keywords):
+            suggestions.extend(keyword_suggestions)
     
     if include_tests:
-        suggestions.append("Test both happy path and error scenarios")
-        suggestions.append("Consider edge cases and boundary conditions")
-    
-    if language.lower() == "python":
-        suggestions.extend([
-            "Use type hints for better code documentation",
-            "Consider using dataclasses or Pydantic for data structures",
-            "Follow PEP 8 style guidelines"
-        ])
-    elif language.lower() in ["javascript", "typescript"]:
-        suggestions.extend([
-            "Use const/let instead of var",
-            "Consider using async/await for asynchronous operations",
-            "Use destructuring and spread operators where appropriate"
-        ])
+        suggestions.extend(_TEST_SUGGESTIONS)
+    
+    suggestions.extend(_LANGUAGE_SUGGESTIONS.get(lang, ()))
     
     prompt = " ".join(prompt_parts)
     
@@ -122,23 +152,14 @@ def generate_code_prompt(
         prompt=prompt,
         suggestions=suggestions,
         language=language,
-        style=style
+        style=style,
+        suggestions_text="\n".join("- " + suggestion for suggestion in suggestions)
     )
 
 
-def get_code_template(language: str = "python", template_type: str = "function") -> str:
-    """Get a code template for common patterns
-    
-    Args:
-        language: Programming language
-        template_type: Type of template (function, class, script)
-        
-    Returns:
-        Code template string
-    """
-    templates = {
-        "python": {
-            "function": '''def {function_name}({parameters}):
+_TEMPLATES = {
+    "python": {
+        "function": '''def {function_name}({parameters}):
     """Function that {description}.
     
     Args:
@@ -148,7 +169,7 @@ def get_code_template(language: str = "python", template_type: str = "function")
         {return_description}
     """
     pass''',
-            "class": '''class {class_name}:
+        "class": '''class {class_name}:
     """Class that {description}.
     
     Attributes:
@@ -173,7 +194,7 @@ def get_code_template(language: str = "python", template_type: str = "function")
             {method_return_description}
         """
         pass''',
-            "script": '''#!/usr/bin/env python3
+        "script": '''#!/usr/bin/env python3
 """
 {script_description}
 """
@@ -194,9 +215,9 @@ def main():
 
 if __name__ == "__main__":
     main()'''
-        },
-        "javascript": {
-            "function": '''/**
+    },
+    "javascript": {
+        "function": '''/**
  * Function that {description}
  * @param {{type}} {parameter} - {parameter_description}
  * @returns {{type}} {return_description}
@@ -204,7 +225,7 @@ if __name__ == "__main__":
 function {function_name}({parameters}) {{
     // Implementation here
 }}''',
-            "class": '''/**
+        "class": '''/**
  * Class that {description}
  */
 class {class_name} {{
@@ -225,7 +246,7 @@ class {class_name} {{
         // Implementation here
     }}
 }}''',
-            "script": '''#!/usr/bin/env node
+        "script": '''#!/usr/bin/env node
 
 /**
  * {script_description}
@@ -240,8 +261,20 @@ function main() {
 if (require.main === module) {
     main();
 }'''
-        }
     }
+}
+
+
+@lru_cache(maxsize=64)
+def get_code_template(language: str = "python", template_type: str = "function") -> str:
+    """Get a code template for common patterns
     
-    lang_templates = templates.get(language.lower(), templates["python"])
+    Args:
+        language: Programming language
+        template_type: Type of template (function, class, script)
+        
+    Returns:
+        Code template string
+    """
+    lang_templates = _TEMPLATES.get(language.lower(), _TEMPLATES["python"])
     return lang_templates.get(template_type, lang_templates["function"])
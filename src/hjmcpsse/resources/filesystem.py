@@ -2,13 +2,19 @@
 File system resource implementation for MCP server
 """
 
+import codecs
 import os
-from pathlib import Path
+import stat
+from operator import itemgetter
 from typing import List, Optional
 from dataclasses import dataclass
 
 
-@dataclass
+# Tried in order when decoding file content; latin-1 accepts any byte sequence
+_TEXT_ENCODINGS = ('utf-8', 'utf-16', 'latin-1')
+
+
+@dataclass(slots=True)
 class FileInfo:
     """Information about a file"""
     name: str
@@ -17,7 +23,7 @@ class FileInfo:
     path: str
 
 
-@dataclass
+@dataclass(slots=True)
 class DirectoryListing:
     """Directory listing with files and subdirectories"""
     path: str
@@ -37,55 +43,66 @@ def list_directory(path: str) -> DirectoryListing:
     Raises:
         OSError: If directory cannot be accessed
     """
-    directory_path = Path(path).resolve()
+    directory_path = os.path.realpath(path)
     
-    if not directory_path.exists():
+    # One stat() answers both "does it exist" and "is it a directory"
+    try:
+        mode = os.stat(directory_path).st_mode
+    except (FileNotFoundError, NotADirectoryError):
         raise OSError(f"Directory does not exist: {path}")
     
-    if not directory_path.is_dir():
+    if not stat.S_ISDIR(mode):
         raise OSError(f"Path is not a directory: {path}")
     
     files = []
     directories = []
     
     try:
-        for item in directory_path.iterdir():
-            try:
-                stat_info = item.stat()
-                file_info = FileInfo(
-                    name=item.name,
-                    size=stat_info.st_size,
-                    is_directory=item.is_dir(),
-                    path=str(item)
-                )
-                
-                if item.is_dir():
-                    directories.append(file_info)
-                else:
-                    files.append(file_info)
+        # scandir entries carry the file type from the directory read itself,
+        # so only the size lookup costs a stat() per entry
+        with os.scandir(directory_path) as entries:
+            for entry in entries:
+                try:
+                    is_directory = entry.is_dir()
+                    file_info = FileInfo(
+                        name=entry.name,
+                        size=entry.stat().st_size,
+                        is_directory=is_directory,
+                        path=entry.path
+                    )
                     
-            except (OSError, PermissionError):
-                continue
+                    # Lowercase each name once here rather than in a sort-key lambda
+                    if is_directory:
+                        directories.append((entry.name.lower(), file_info))
+                    else:
+                        files.append((entry.name.lower(), file_info))
+                        
+                except (OSError, PermissionError):
+                    continue
                 
     except PermissionError:
         raise OSError(f"Permission denied accessing directory: {path}")
     
-    files.sort(key=lambda x: x.name.lower())
-    directories.sort(key=lambda x: x.name.lower())
+    sort_key = itemgetter(0)
+    files.sort(key=sort_key)
+    directories.sort(key=sort_key)
     
     return DirectoryListing(
-        path=str(directory_path),
-        files=files,
-        directories=directories
+        path=directory_path,
+        files=[file_info for _, file_info in files],
+        directories=[dir_info for _, dir_info in directories]
     )
 
 
-def get_file_content(path: str, max_size: int = 1024 * 1024) -> str:
+def get_file_content(path: str, max_size: int = 1024 * 1024, max_chars: Optional[int] = None) -> str:
     """Get content of a text file
     
     Args:
         path: File path to read
-        max_size: Maximum file size to read (default 1MB)
+        max_size: Maximum file size to read (default 1MB); not applied when
+            max_chars is given, since only the head of the file is read then
+        max_chars: Return at most this many characters, reading only the head of
+            the file (None reads the whole file)
         
     Returns:
         File content as string
@@ -93,31 +110,47 @@ def get_file_content(path: str, max_size: int = 1024 * 1024) -> str:
     Raises:
         OSError: If file cannot be accessed or is too large
     """
-    file_path = Path(path).resolve()
+    file_path = os.path.realpath(path)
     
-    if not file_path.exists():
+    # One stat() covers existence, file type and size
+    try:
+        stat_info = os.stat(file_path)
+    except (FileNotFoundError, NotADirectoryError):
         raise OSError(f"File does not exist: {path}")
     
-    if not file_path.is_file():
+    if not stat.S_ISREG(stat_info.st_mode):
         raise OSError(f"Path is not a file: {path}")
     
     try:
-        stat_info = file_path.stat()
-        if stat_info.st_size > max_size:
+        if max_chars is None and stat_info.st_size > max_size:
             raise OSError(f"File too large: {stat_info.st_size} bytes (max {max_size})")
         
-        encodings = ['utf-8', 'utf-16', 'latin-1']
+        # Read once and try each encoding on the same bytes instead of re-reading the file
+        truncated = False
+        with open(file_path, 'rb') as f:
+            if max_chars is None:
+                content = f.read()
+            else:
+                # A character (or a BOM) takes at most 4 bytes in any of _TEXT_ENCODINGS
+                limit = (max_chars + 1) * 4
+                content = f.read(limit + 1)
+                truncated = len(content) > limit
+                content = content[:limit]
         
-        for encoding in encodings:
+        for encoding in _TEXT_ENCODINGS:
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
+                if truncated:
+                    # The head may end mid-character; the incremental decoder holds that tail back
+                    text = codecs.getincrementaldecoder(encoding)().decode(content)
+                else:
+                    text = content.decode(encoding)
             except UnicodeDecodeError:
                 continue
+            # Match text-mode reads, which translate \r\n and \r to \n
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+            return text if max_chars is None else text[:max_chars]
         
-        with open(file_path, 'rb') as f:
-            content = f.read()
-            return f"Binary file ({len(content)} bytes): {content[:100].hex()}..."
+        return f"Binary file ({len(content)} bytes): {content[:100].hex()}..."
             
     except PermissionError:
         raise OSError(f"Permission denied reading file: {path}")
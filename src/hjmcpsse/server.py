@@ -1,41 +1,46 @@
 import argparse
 import asyncio
 import logging
-from pathlib import Path
+import os
+from functools import lru_cache
 from typing import Any, Dict, List
 from mcp.server.fastmcp import FastMCP
 from .resources.filesystem import list_directory, get_file_content
 from .tools.calculator import calculate
 from .prompts.code_generator import generate_code_prompt, get_code_template
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def get_file_resource(path: str) -> str:
+async def get_file_resource(path: str) -> str:
     """Browse filesystem and get file/directory information"""
+    # Directory scans and file reads block, so keep them off the event loop
+    return await asyncio.to_thread(_render_file_resource, path)
+
+
+def _render_file_resource(path: str) -> str:
+    """Render a directory listing or file content as text"""
     try:
-        file_path = Path(path)
-        
-        if file_path.is_dir():
+        if os.path.isdir(path):
             listing = list_directory(path)
-            result = f"Directory: {listing.path}\n\n"
+            # Collect the lines and join once; repeated str += is quadratic in the entry count
+            parts = [f"Directory: {listing.path}\n\n"]
             
             if listing.directories:
-                result += "Directories:\n"
-                for dir_info in listing.directories:
-                    result += f"  📁 {dir_info.name}\n"
-                result += "\n"
+                parts.append("Directories:\n")
+                parts.extend(f"  📁 {dir_info.name}\n" for dir_info in listing.directories)
+                parts.append("\n")
             
             if listing.files:
-                result += "Files:\n"
-                for file_info in listing.files:
-                    size_kb = file_info.size / 1024
-                    result += f"  📄 {file_info.name} ({size_kb:.1f} KB)\n"
+                parts.append("Files:\n")
+                parts.extend(
+                    f"  📄 {file_info.name} ({file_info.size / 1024:.1f} KB)\n"
+                    for file_info in listing.files
+                )
             
-            return result
+            return "".join(parts)
         
-        elif file_path.is_file():
+        elif os.path.isfile(path):
             content = get_file_content(path)
             return f"File: {path}\n\n{content}"
         
@@ -52,7 +57,7 @@ def calculator(expression: str) -> Dict[str, Any]:
     Args:
         expression: Mathematical expression to evaluate (e.g., "2 + 3 * 4")
     """
-    result = calculate(expression)
+    result = calculate(expression.strip())
     return {
         "expression": result.expression,
         "result": result.result,
@@ -77,6 +82,18 @@ def code_generator(
         include_tests: Whether to include unit tests
         include_docs: Whether to include documentation
     """
+    return _format_code_prompt(description, language, style, include_tests, include_docs)
+
+
+@lru_cache(maxsize=256)
+def _format_code_prompt(
+    description: str,
+    language: str,
+    style: str,
+    include_tests: bool,
+    include_docs: bool
+) -> str:
+    """Render the full prompt text, cached for repeat invocations"""
     prompt_data = generate_code_prompt(
         description=description,
         language=language,
@@ -85,13 +102,9 @@ def code_generator(
         include_docs=include_docs
     )
     
-    result = prompt_data.prompt
-    
-    if prompt_data.suggestions:
-        suggestions_text = "\n".join(f"- {suggestion}" for suggestion in prompt_data.suggestions)
-        result += f"\n\nAdditional suggestions:\n{suggestions_text}"
-    
-    return result
+    if prompt_data.suggestions_text:
+        return prompt_data.prompt + "\n\nAdditional suggestions:\n" + prompt_data.suggestions_text
+    return prompt_data.prompt
 
 
 def get_template(language: str = "python", template_type: str = "function") -> Dict[str, Any]:
@@ -109,6 +122,37 @@ def get_template(language: str = "python", template_type: str = "function") -> D
     }
 
 
+def _install_uvloop() -> None:
+    """Use uvloop's libuv-based event loop when it is installed
+
+    uvloop is optional (see the ``fast`` extra) and does not support Windows,
+    where the default Proactor event loop is kept.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("Using uvloop event loop")
+
+
+def build_app(host: str = "localhost", port: int = 8000) -> FastMCP:
+    """Create the FastMCP app with all resources, tools and prompts registered
+    
+    Args:
+        host: Host the SSE transport binds to
+        port: Port the SSE transport binds to
+    """
+    mcp = FastMCP("hjmcpsse", host=host, port=port)
+    
+    mcp.resource("files://{path}")(get_file_resource)
+    mcp.tool()(calculator)
+    mcp.prompt("code_generator")(code_generator)
+    mcp.tool()(get_template)
+    
+    return mcp
+
+
 def main():
     """Run the MCP server"""
     parser = argparse.ArgumentParser(description="hjmcpsse MCP Server")
@@ -118,23 +162,19 @@ def main():
     
     args = parser.parse_args()
     
-    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()))
+    _install_uvloop()
     
-    mcp = FastMCP("hjmcpsse", host=args.host, port=args.port)
-    
-    mcp.resource("files://{path}")(get_file_resource)
-    mcp.tool()(calculator)
-    mcp.prompt("code_generator")(code_generator)
-    mcp.tool()(get_template)
+    mcp = build_app(args.host, args.port)
     
-    logger.info(f"Starting hjmcpsse MCP server with SSE transport on {args.host}:{args.port}...")
+    logger.info("Starting hjmcpsse MCP server with SSE transport on %s:%s...", args.host, args.port)
     
     try:
         mcp.run(transport="sse")
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
     except Exception as e:
-        logger.error(f"Server error: {e}")
+        logger.error("Server error: %s", e)
         raise
 
 
@@ -5,11 +5,13 @@ Calculator tool implementation for MCP server
 import ast
 import operator
 import math
-from typing import Any, Dict, Union
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Tuple, Union
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class CalculationResult:
     """Result of a calculation operation"""
     expression: str
@@ -18,15 +20,129 @@ class CalculationResult:
     error: str = None
 
 
+# Opcodes of the compiled form; each instruction is an (opcode, argument) pair
+_CONST = 0
+_BINOP = 1
+_CALL = 2
+_UNARY = 3
+_BUILD_LIST = 4
+_BUILD_TUPLE = 5
+_CONST_LIST = 6
+_RAISE = 7
+
+Instruction = Tuple[int, Any]
+
+# Longer input is rejected before parsing, which also keeps it out of the caches
+MAX_EXPRESSION_LENGTH = 4096
+
+# Integer powers whose result would exceed this many bits are rejected. Exact
+# integer exponentiation has no other bound: a short input such as 9**9**9 would
+# otherwise run for hours. 14,000 bits keeps results under the 4300 digits that
+# int-to-str conversion (and so JSON encoding) accepts by default.
+MAX_POWER_BITS = 14_000
+
+# Repeating a str/bytes/list/tuple past this many items is rejected for the same
+# reason: 'a'*10**9 would allocate a gigabyte from a nine-character expression
+MAX_SEQUENCE_LENGTH = 100_000
+
+# Longer str/bytes/tuple values are neither folded into compiled code nor kept
+# in the result cache, so neither holds on to a large value
+_MAX_RETAINED_LENGTH = 1024
+
+# Bare numeric literals that int()/float() read exactly as Python would. Integers
+# with a leading zero are Python syntax errors and very long ones exceed int()'s
+# digit limit, so both are left to the parser.
+_NUMBER_RE = re.compile(
+    r'[-+]?(?:(?P<int>0+|[1-9][0-9]{0,17})'
+    r'|(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?'
+    r'|[0-9]+[eE][-+]?[0-9]+)'
+)
+
+
+def _checked_pow(base, exponent, modulus=None):
+    """pow() that refuses integer powers too large to compute in reasonable time"""
+    if modulus is not None:
+        # Modular exponentiation stays within the size of the modulus
+        return pow(base, exponent, modulus)
+    if (isinstance(base, int) and isinstance(exponent, int)
+            and exponent > 0 and abs(base) > 1
+            and exponent * math.log2(abs(base)) > MAX_POWER_BITS):
+        raise ValueError(f"Result too large (over {MAX_POWER_BITS} bits)")
+    return pow(base, exponent)
+
+
+def _sequence_length(sequence, limit: int) -> int:
+    """Items in a sequence including those of nested lists/tuples, counted until past limit
+    
+    Nested items count because [[0]*1000]*1000 shares one inner list in memory
+    but expands to a million items once serialized.
+    """
+    total = 0
+    pending = [sequence]
+    while pending and total <= limit:
+        item = pending.pop()
+        total += len(item)
+        if isinstance(item, (list, tuple)):
+            pending.extend(x for x in item if isinstance(x, (list, tuple)))
+    return total
+
+
+def _checked_mul(left, right):
+    """Multiplication that refuses to repeat a sequence past MAX_SEQUENCE_LENGTH items"""
+    for sequence, count in ((left, right), (right, left)):
+        if (isinstance(sequence, (str, bytes, list, tuple)) and isinstance(count, int) and count > 0
+                and _sequence_length(sequence, MAX_SEQUENCE_LENGTH // count) * count > MAX_SEQUENCE_LENGTH):
+            raise ValueError(f"Result too large (over {MAX_SEQUENCE_LENGTH} items)")
+    return left * right
+
+
+def _fold_constants(code: List[Instruction], start: int, func, allow_lists: bool = False) -> bool:
+    """Replace the instructions from start on with one CONST holding func(*operands)
+    
+    Only applies when every operand is a CONST (or, with allow_lists, a
+    CONST_LIST, as for sum([1, 2, 3])). Returns False, leaving code untouched,
+    when an operand is not constant or func raises, so the error is still
+    reported at run time in its original order.
+    """
+    values = []
+    for op, arg in code[start:]:
+        if op == _CONST:
+            values.append(arg)
+        elif op == _CONST_LIST and allow_lists:
+            values.append(list(arg))
+        else:
+            return False
+    try:
+        value = func(*values)
+    except Exception:
+        return False
+    if allow_lists and isinstance(value, list):
+        # e.g. max([1], [2]) returns one of its lists, which must not be shared
+        return False
+    if isinstance(value, (str, bytes, tuple)) and len(value) > _MAX_RETAINED_LENGTH:
+        # e.g. 'a' * 10**8: build it on each run rather than storing it in the code
+        return False
+    del code[start:]
+    code.append((_CONST, value))
+    return True
+
+
+def _compile_eval(expression: str) -> Tuple[Instruction, ...]:
+    """Parse and compile an expression"""
+    code = []
+    SafeCalculator._compile(ast.parse(expression, mode='eval').body, code)
+    return tuple(code)
+
+
 class SafeCalculator:
     """Safe calculator that evaluates mathematical expressions using AST parsing"""
     
     operators = {
         ast.Add: operator.add,
         ast.Sub: operator.sub,
-        ast.Mult: operator.mul,
+        ast.Mult: _checked_mul,
         ast.Div: operator.truediv,
-        ast.Pow: operator.pow,
+        ast.Pow: _checked_pow,
         ast.Mod: operator.mod,
         ast.FloorDiv: operator.floordiv,
         ast.USub: operator.neg,
@@ -39,7 +155,7 @@ class SafeCalculator:
         'min': min,
         'max': max,
         'sum': sum,
-        'pow': pow,
+        'pow': _checked_pow,
         'sqrt': math.sqrt,
         'sin': math.sin,
         'cos': math.cos,
@@ -49,6 +165,9 @@ class SafeCalculator:
         'exp': math.exp,
         'ceil': math.ceil,
         'floor': math.floor,
+    }
+    
+    constants = {
         'pi': math.pi,
         'e': math.e,
     }
@@ -62,9 +181,28 @@ class SafeCalculator:
         Returns:
             CalculationResult with the result or error information
         """
+        if len(expression) > MAX_EXPRESSION_LENGTH:
+            return CalculationResult(
+                expression=expression,
+                result=None,
+                success=False,
+                error=f"Expression too long (max {MAX_EXPRESSION_LENGTH} characters)"
+            )
+        return self._evaluate(expression)
+    
+    def _evaluate(self, expression: str) -> CalculationResult:
+        """Compile and run an expression, converting failures into error results"""
         try:
-            node = ast.parse(expression, mode='eval')
-            result = self._eval_node(node.body)
+            number = _NUMBER_RE.fullmatch(expression)
+            if number is not None:
+                # Plain number: skip parsing and compilation
+                return CalculationResult(
+                    expression=expression,
+                    result=int(expression) if number.group('int') is not None else float(expression),
+                    success=True
+                )
+            
+            result = self._execute(_compile_eval(expression))
             
             return CalculationResult(
                 expression=expression,
@@ -101,55 +239,188 @@ class SafeCalculator:
                 error=f"Calculation error: {str(e)}"
             )
     
-    def _eval_node(self, node: ast.AST) -> Union[float, int]:
-        """Recursively evaluate an AST node"""
-        if isinstance(node, ast.Constant):
-            return node.value
-        elif isinstance(node, ast.Num):  # Python < 3.8 compatibility
-            return node.n
-        elif isinstance(node, ast.BinOp):
-            left = self._eval_node(node.left)
-            right = self._eval_node(node.right)
-            op = self.operators.get(type(node.op))
-            if op is None:
-                raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
-            return op(left, right)
-        elif isinstance(node, ast.UnaryOp):
-            operand = self._eval_node(node.operand)
-            op = self.operators.get(type(node.op))
-            if op is None:
-                raise ValueError(f"Unsupported unary operator: {type(node.op).__name__}")
-            return op(operand)
-        elif isinstance(node, ast.Call):
-            func_name = node.func.id if isinstance(node.func, ast.Name) else None
-            if func_name not in self.functions:
-                raise ValueError(f"Unsupported function: {func_name}")
-            
-            args = [self._eval_node(arg) for arg in node.args]
-            func = self.functions[func_name]
+    @classmethod
+    def _compile(cls, node: ast.AST, code: List[Instruction]) -> None:
+        """Append the post-order instructions for an AST node to code
+        
+        Unsupported constructs compile to a _RAISE instruction at the point a
+        recursive walk would reach them, so the first error reported is unchanged.
+        Handlers for composite nodes are generators that yield each child to be
+        compiled; driving them from an explicit stack keeps deeply nested
+        expressions from exhausting Python's recursion limit.
+        """
+        pending = []
+        while True:
+            handler = _COMPILERS.get(type(node))
+            if handler is None:
+                code.append((_RAISE, f"Unsupported node type: {type(node).__name__}"))
+            else:
+                children = handler(cls, node, code)
+                if children is not None:
+                    pending.append(children)
             
-            if func_name in ['min', 'max', 'sum'] and len(args) == 1 and isinstance(args[0], (list, tuple)):
-                return func(args[0])
+            # Resume the innermost unfinished handler until one asks for a child
+            while pending:
+                node = next(pending[-1], None)
+                if node is not None:
+                    break
+                pending.pop()
             else:
-                return func(*args)
-        elif isinstance(node, ast.Name):
-            if node.id in self.functions:
-                value = self.functions[node.id]
-                if callable(value):
-                    raise ValueError(f"Function {node.id} requires arguments")
-                return value
+                return
+    
+    def _execute(self, code: Tuple[Instruction, ...]) -> Union[float, int]:
+        """Run compiled instructions on a value stack"""
+        # Bind the stack methods once so the loop uses fast locals
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        
+        for op, arg in code:
+            if op == _CONST:
+                push(arg)
+            elif op == _BINOP:
+                right = pop()
+                stack[-1] = arg(stack[-1], right)
+            elif op == _CALL:
+                func, nargs = arg
+                if nargs:
+                    args = stack[-nargs:]
+                    del stack[-nargs:]
+                else:
+                    args = []
+                push(func(*args))
+            elif op == _UNARY:
+                stack[-1] = arg(stack[-1])
+            elif op == _BUILD_LIST or op == _BUILD_TUPLE:
+                if arg:
+                    items = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    items = []
+                push(items if op == _BUILD_LIST else tuple(items))
+            elif op == _CONST_LIST:
+                push(list(arg))
             else:
-                raise ValueError(f"Undefined variable: {node.id}")
-        elif isinstance(node, ast.List):
-            return [self._eval_node(item) for item in node.elts]
-        elif isinstance(node, ast.Tuple):
-            return tuple(self._eval_node(item) for item in node.elts)
-        else:
-            raise ValueError(f"Unsupported node type: {type(node).__name__}")
+                raise ValueError(arg)
+        
+        return stack[-1]
+
+
+# Per-node compile handlers, dispatched on the exact node type by
+# SafeCalculator._compile, which passes itself as calc for the operator and
+# function tables. Composite handlers yield their children and resume once each
+# is compiled.
+
+def _compile_constant(calc: type, node: ast.Constant, code: List[Instruction]) -> None:
+    code.append((_CONST, node.value))
+
+
+def _compile_binop(calc: type, node: ast.BinOp, code: List[Instruction]) -> Iterator[ast.AST]:
+    start = len(code)
+    yield node.left
+    yield node.right
+    op = calc.operators.get(type(node.op))
+    if op is None:
+        code.append((_RAISE, f"Unsupported operator: {type(node.op).__name__}"))
+    elif not _fold_constants(code, start, op):
+        code.append((_BINOP, op))
+
+
+def _compile_unaryop(calc: type, node: ast.UnaryOp, code: List[Instruction]) -> Iterator[ast.AST]:
+    start = len(code)
+    yield node.operand
+    op = calc.operators.get(type(node.op))
+    if op is None:
+        code.append((_RAISE, f"Unsupported unary operator: {type(node.op).__name__}"))
+    elif not _fold_constants(code, start, op):
+        code.append((_UNARY, op))
+
+
+def _compile_call(calc: type, node: ast.Call, code: List[Instruction]) -> Iterator[ast.AST]:
+    try:
+        func_name = node.func.id
+    except AttributeError:
+        # Not a plain name, e.g. math.sin(x) or (lambda: 1)()
+        func_name = None
+    if func_name not in calc.functions:
+        code.append((_RAISE, f"Unsupported function: {func_name}"))
+        return
+    
+    func = calc.functions[func_name]
+    start = len(code)
+    yield from node.args
+    if _fold_constants(code, start, func, allow_lists=True):
+        return
+    
+    # One- and two-argument calls have the same stack effect as UNARY/BINOP,
+    # which apply func in place without building an argument list
+    nargs = len(node.args)
+    if nargs == 1:
+        code.append((_UNARY, func))
+    elif nargs == 2:
+        code.append((_BINOP, func))
+    else:
+        code.append((_CALL, (func, nargs)))
+
+
+def _compile_name(calc: type, node: ast.Name, code: List[Instruction]) -> None:
+    value = calc.constants.get(node.id)
+    if value is not None:
+        code.append((_CONST, value))
+    elif node.id in calc.functions:
+        code.append((_RAISE, f"Function {node.id} requires arguments"))
+    else:
+        code.append((_RAISE, f"Undefined variable: {node.id}"))
+
+
+def _compile_list(calc: type, node: ast.List, code: List[Instruction]) -> Iterator[ast.AST]:
+    start = len(code)
+    yield from node.elts
+    if all(op == _CONST for op, _ in code[start:]):
+        # Keep the items as a tuple and copy them into a fresh list on each run
+        items = tuple(arg for _, arg in code[start:])
+        del code[start:]
+        code.append((_CONST_LIST, items))
+    else:
+        code.append((_BUILD_LIST, len(node.elts)))
+
+
+def _compile_tuple(calc: type, node: ast.Tuple, code: List[Instruction]) -> Iterator[ast.AST]:
+    start = len(code)
+    yield from node.elts
+    # Tuples are immutable, so an all-constant one can be shared between runs
+    if not _fold_constants(code, start, lambda *items: items):
+        code.append((_BUILD_TUPLE, len(node.elts)))
+
+
+_COMPILERS = {
+    ast.Constant: _compile_constant,
+    ast.BinOp: _compile_binop,
+    ast.UnaryOp: _compile_unaryop,
+    ast.Call: _compile_call,
+    ast.Name: _compile_name,
+    ast.List: _compile_list,
+    ast.Tuple: _compile_tuple,
+}
 
 
 _calculator = SafeCalculator()
 
+# Expressions have no free variables, so each result (including errors) can be
+# reused. Only small immutable results are kept: lists are mutable and must not
+# be shared between callers, and large values would stay alive in the cache.
+_RESULT_CACHE_SIZE = 2048
+_result_cache: "OrderedDict[str, CalculationResult]" = OrderedDict()
+
+
+def _is_cacheable(value: Any) -> bool:
+    """Whether a result value is small and immutable enough to share between calls"""
+    if isinstance(value, (str, bytes)):
+        return len(value) <= _MAX_RETAINED_LENGTH
+    if isinstance(value, int):
+        return value.bit_length() <= MAX_POWER_BITS
+    return value is None or isinstance(value, (float, complex))
+
 
 def calculate(expression: str) -> CalculationResult:
     """Calculate a mathematical expression safely
@@ -160,4 +431,17 @@ def calculate(expression: str) -> CalculationResult:
     Returns:
         CalculationResult with the result or error information
     """
-    return _calculator.evaluate(expression)
+    try:
+        # Each OrderedDict call is atomic, so a concurrent eviction only turns a hit into a miss
+        _result_cache.move_to_end(expression)
+        return _result_cache[expression]
+    except KeyError:
+        pass
+    
+    result = _calculator.evaluate(expression)
+    # Oversized input is rejected without caching so it can't occupy cache entries
+    if len(expression) <= MAX_EXPRESSION_LENGTH and _is_cacheable(result.result):
+        _result_cache[expression] = result
+        if len(_result_cache) > _RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+    return result
@@ -0,0 +1,240 @@
+"""
+Tests for the Azure AI integration helpers that run without network access
+"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("azure.ai.inference")
+pytest.importorskip("azure.identity")
+
+from azure_ai_integration import AzureAIConfig, AzureAIMCPClient, _compact_history, _dumps
+
+
+def _exchange(call_id):
+    """An assistant tool-call message and the tool message answering it"""
+    return [
+        {"role": "assistant", "content": None, "tool_calls": [{"id": call_id}]},
+        {"role": "tool", "tool_call_id": call_id, "content": call_id},
+    ]
+
+
+def test_compact_history_keeps_short_history():
+    messages = [{"role": "user", "content": "u"}, *_exchange("a")]
+    assert _compact_history(messages, 2) is messages
+
+
+def test_compact_history_drops_oldest_exchanges():
+    system = {"role": "system", "content": "s"}
+    user = {"role": "user", "content": "u"}
+    messages = [system, user, *_exchange("a"), *_exchange("b"), *_exchange("c")]
+    assert _compact_history(messages, 2) == [system, user, *_exchange("b"), *_exchange("c")]
+
+
+def test_compact_history_keeps_other_messages_between_exchanges():
+    note = {"role": "user", "content": "next"}
+    messages = [*_exchange("a"), note, *_exchange("b")]
+    assert _compact_history(messages, 1) == [note, *_exchange("b")]
+
+
+def test_compact_history_drops_parallel_calls_as_one_exchange():
+    user = {"role": "user", "content": "u"}
+    parallel = [
+        {"role": "assistant", "content": None, "tool_calls": [{"id": "a"}, {"id": "b"}]},
+        {"role": "tool", "tool_call_id": "a", "content": "a"},
+        {"role": "tool", "tool_call_id": "b", "content": "b"},
+    ]
+    assert _compact_history([user, *parallel], 0) == [user]
+
+
+@pytest.mark.parametrize("value, encoded", [
+    ({"result": 5.0, "success": True}, b'{"result":5.0,"success":true}'),
+    ({"result": float("inf")}, b'{"result": Infinity}'),
+    ([1, {"result": float("nan")}], b'[1, {"result": NaN}]'),
+    ({"result": 2**100}, b'{"result": 1267650600228229401496703205376}'),
+])
+def test_dumps(value, encoded):
+    assert _dumps(value) == encoded
+
+
+def test_dumps_sends_huge_ints_as_hex():
+    assert _dumps({"result": 2**40000}) == b'{"result": "' + hex(2**40000).encode() + b'"}'
+
+
+@pytest.fixture
+def client():
+    config = AzureAIConfig(
+        endpoint="https://example.openai.azure.com/",
+        model_name="gpt-4o",
+        api_key="key",
+        deployment_name="gpt-4o",
+        retry_base_delay=0.5,
+        retry_max_delay=8.0,
+    )
+    return AzureAIMCPClient(config)
+
+
+def test_retry_delay_uses_numeric_retry_after(client):
+    assert client._retry_delay(0, "2") == 2.0
+    assert client._retry_delay(3, "0") == 0.0
+    assert client._retry_delay(0, "-5") == 0.0
+
+
+def test_retry_delay_waits_out_retry_after_beyond_backoff_cap(client):
+    assert client._retry_delay(0, "30") == 30.0
+
+
+def test_retry_delay_gives_up_on_retry_after_past_max(client):
+    assert client._retry_delay(0, "3600") is None
+
+
+@pytest.mark.parametrize("attempt, backoff", [(0, 0.5), (1, 1.0), (2, 2.0), (5, 8.0)])
+def test_retry_delay_backs_off_exponentially(client, attempt, backoff):
+    for retry_after in (None, "Wed, 21 Oct 2015 07:28:00 GMT"):
+        delay = client._retry_delay(attempt, retry_after)
+        assert backoff <= delay <= backoff + 0.5
+
+
+def _sse(chunk):
+    return b"data: " + json.dumps(chunk).encode() + b"\n"
+
+
+class _FakeStreamResponse:
+    """Just enough of aiohttp.ClientResponse for a streamed chat completion"""
+
+    status = 200
+    headers = {}
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __await__(self):
+        return asyncio.sleep(0, self).__await__()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    @property
+    def content(self):
+        async def lines():
+            for line in self.lines:
+                yield line
+        return lines()
+
+
+class _FakeSession:
+    """Replays one list of SSE lines per request and records the request bodies"""
+
+    closed = False
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.bodies = []
+        self.options = []
+
+    def request(self, method, url, headers=None, data=None, **options):
+        self.bodies.append(json.loads(data))
+        self.options.append(options)
+        return _FakeStreamResponse(self.responses.pop(0))
+
+    async def close(self):
+        pass
+
+
+def _stream(client, session):
+    async def collect():
+        client._session = session
+        return [event async for event in client.chat_with_tools_stream([{"role": "user", "content": "u"}])]
+    return asyncio.run(collect())
+
+
+def test_stream_assembles_tool_call_fragments(client):
+    session = _FakeSession(
+        [
+            b": keep-alive\n",
+            _sse({"choices": [{"delta": {"role": "assistant", "content": "Let me "}}]}),
+            _sse({"choices": [{"delta": {"content": "check."}}]}),
+            _sse({"choices": [{"delta": {"tool_calls": [
+                {"index": 0, "id": "t0", "function": {"name": "calcu", "arguments": ""}}]}}]}),
+            _sse({"choices": [{"delta": {"tool_calls": [
+                {"index": 0, "function": {"name": "lator", "arguments": "{\"expre"}}]}}]}),
+            _sse({"choices": [{"delta": {"tool_calls": [
+                {"index": 0, "function": {"arguments": "ssion\": \"6*7\"}"}}]}}]}),
+            _sse({"choices": [{"delta": {"tool_calls": [
+                {"index": 1, "id": "t1", "function": {"name": "calculator", "arguments": "{\"expression\": \"1+1\"}"}}]}}]}),
+            _sse({"choices": [{"delta": {}, "finish_reason": "tool_calls"}]}),
+            b"data: [DONE]\n",
+        ],
+        [
+            _sse({"choices": []}),
+            _sse({"choices": [{"delta": {"content": "42"}}]}),
+            _sse({"choices": [{"delta": {}, "finish_reason": "stop"}]}),
+            b"data: [DONE]\n",
+        ],
+    )
+    events = _stream(client, session)
+
+    assert [(e["type"], e.get("content") or e.get("tool")) for e in events[:-1]] == [
+        ("content", "Let me "),
+        ("content", "check."),
+        ("tool_call", "calculator"),
+        ("tool_call", "calculator"),
+        ("content", "42"),
+    ]
+    assert [e["result"]["data"]["result"] for e in events if e["type"] == "tool_call"] == [42, 2]
+    assert events[-1]["response"] == "42"
+    assert events[-1]["finish_reason"] == "stop"
+
+    assistant, first_result, second_result = session.bodies[1]["messages"][1:]
+    assert assistant["content"] == "Let me check."
+    assert [call["id"] for call in assistant["tool_calls"]] == ["t0", "t1"]
+    assert assistant["tool_calls"][0]["function"] == {"name": "calculator", "arguments": "{\"expression\": \"6*7\"}"}
+    assert (first_result["tool_call_id"], second_result["tool_call_id"]) == ("t0", "t1")
+    # The stream is bounded by read inactivity, not the session's total timeout
+    assert session.options[0]["timeout"].total is None
+
+
+def test_stream_stops_when_model_repeats_tool_calls(client):
+    repeated = [
+        _sse({"choices": [{"delta": {"tool_calls": [
+            {"index": 0, "id": "t", "function": {"name": "calculator", "arguments": "{\"expression\": \"1+1\"}"}}]}}]}),
+        _sse({"choices": [{"delta": {}, "finish_reason": "tool_calls"}]}),
+        b"data: [DONE]\n",
+    ]
+    session = _FakeSession(repeated, repeated)
+    events = _stream(client, session)
+    assert events[-1]["finish_reason"] == "no_progress"
+    assert len(events[-1]["tool_calls"]) == 1
+    assert len(session.bodies) == 2
+
+
+def _tool_calls(expression):
+    return [{"id": "t", "type": "function", "function": {"name": "calculator", "arguments": expression}}]
+
+
+def test_check_tool_round_allows_new_calls(client):
+    stop, request = client._check_tool_round(None, _tool_calls("1+1"), 0, None)
+    assert stop is None
+    stop, _ = client._check_tool_round(None, _tool_calls("2+2"), 0, request)
+    assert stop is None
+
+
+def test_check_tool_round_stops_on_repeated_calls(client):
+    _, request = client._check_tool_round("thinking", _tool_calls("1+1"), 0, None)
+    stop, _ = client._check_tool_round("thinking", _tool_calls("1+1"), 0, request)
+    assert stop == {"response": "thinking", "finish_reason": "no_progress"}
+
+
+def test_check_tool_round_stops_past_token_budget():
+    config = AzureAIConfig(endpoint="https://example.openai.azure.com/", model_name="gpt-4o",
+                           api_key="key", deployment_name="gpt-4o", token_budget=100)
+    client = AzureAIMCPClient(config)
+    assert client._check_tool_round(None, _tool_calls("1+1"), 100, None)[0] is None
+    stop, _ = client._check_tool_round(None, _tool_calls("1+1"), 101, None)
+    assert stop["finish_reason"] == "token_budget_exceeded"
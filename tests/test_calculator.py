@@ -0,0 +1,224 @@
+"""
+Regression tests for the calculator tool
+"""
+
+import pytest
+
+from hjmcpsse.tools.calculator import (
+    MAX_EXPRESSION_LENGTH,
+    SafeCalculator,
+    _compile_eval,
+    _result_cache,
+    calculate,
+)
+
+# (expression, expected result, expected error). Results are compared by repr so
+# int/float and -0.0/0.0 differences are caught too.
+CASES = [
+    # Arithmetic and precedence
+    ("2+3*4", 14, None),
+    ("2 ** 3 ** 2", 512, None),
+    ("2**-1", 0.5, None),
+    ("10/4", 2.5, None),
+    ("7//2", 3, None),
+    ("-7%3", 2, None),
+    ("10 - -3", 13, None),
+    ("+-+-1", 1, None),
+    ("0**0", 1, None),
+    ("0.1+0.2", 0.30000000000000004, None),
+    ("1e308*10", float("inf"), None),
+    ("10**400", 10**400, None),
+    ("9**9**2", 9**81, None),
+    ("(-8)**(1/3)", (1.0000000000000002+1.7320508075688772j), None),
+    ("1j*1j", (-1+0j), None),
+    ("'a'*3", "aaa", None),
+    # Functions and constants
+    ("sqrt(16) + sin(pi/2)", 5.0, None),
+    ("sqrt(144) + 5 * 3", 27.0, None),
+    ("abs(-3)", 3, None),
+    ("round(2.567, 2)", 2.57, None),
+    ("round(2.5)", 2, None),
+    ("round(1e20)", 100000000000000000000, None),
+    ("min(1,2,3)", 1, None),
+    ("max([4,5,1])", 5, None),
+    ("max(1,2,key=3)", 2, None),
+    ("sum([1,2,3])", 6, None),
+    ("sum((1,2))", 3, None),
+    ("sum([1,2],0.5)", 3.5, None),
+    ("sum([[1],[2]],[])", [1, 2], None),
+    ("max([1,2],[3])", [3], None),
+    ("pow(2,8)", 256, None),
+    ("pow(2,8,5)", 1, None),
+    ("pow(2,-1)", 0.5, None),
+    ("log(100,10)", 2.0, None),
+    ("log10(1000)", 3.0, None),
+    ("exp(1)", 2.718281828459045, None),
+    ("ceil(2.1)", 3, None),
+    ("floor(-2.1)", -3, None),
+    ("tan(pi/4)", 0.9999999999999999, None),
+    ("abs(3+4j)", 5.0, None),
+    ("pi*2", 6.283185307179586, None),
+    ("sqrt(sqrt(sqrt(sqrt(256))))", 1.4142135623730951, None),
+    # Containers
+    ("[1,2,3]", [1, 2, 3], None),
+    ("[1,[2,3]]", [1, [2, 3]], None),
+    ("[1,2]*2", [1, 2, 1, 2], None),
+    ("[]", [], None),
+    ("(1,2)", (1, 2), None),
+    ("(1,)", (1,), None),
+    ("(1,2)+(3,)", (1, 2, 3), None),
+    ("([1],2)", ([1], 2), None),
+    # Plain numbers (parser fast path)
+    ("5", 5, None),
+    ("5 ", 5, None),
+    ("\n5", 5, None),
+    ("-5", -5, None),
+    ("- 5", -5, None),
+    ("-0", 0, None),
+    ("-0.0", -0.0, None),
+    ("00", 0, None),
+    ("01.5", 1.5, None),
+    ("1.", 1.0, None),
+    (".5", 0.5, None),
+    ("1E+5", 100000.0, None),
+    ("-1e-5", -1e-05, None),
+    ("1e999", float("inf"), None),
+    ("1e-400", 0.0, None),
+    ("9999999999999999999", 9999999999999999999, None),
+    ("1_0", 10, None),
+    ("0x1f", 31, None),
+    ("1.5j", 1.5j, None),
+    ("True", True, None),
+    ("None", None, None),
+    # Errors
+    ("1/0", None, "Division by zero"),
+    ("1//0", None, "Division by zero"),
+    ("5%0", None, "Division by zero"),
+    ("sqrt(-1)", None, "Math error: math domain error"),
+    ("log(0)", None, "Math error: math domain error"),
+    ("exp(1000)", None, "Calculation error: math range error"),
+    ("sqrt()", None, "Math error: math.sqrt() takes exactly one argument (0 given)"),
+    ("max()", None, "Math error: max expected at least 1 argument, got 0"),
+    ("min([])", None, "Math error: min() arg is an empty sequence"),
+    ("sum(1)", None, "Math error: 'int' object is not iterable"),
+    ("abs('x')", None, "Math error: bad operand type for abs(): 'str'"),
+    ("sqrt", None, "Math error: Function sqrt requires arguments"),
+    ("foo(1)", None, "Math error: Unsupported function: foo"),
+    ("pi(1)", None, "Math error: Unsupported function: pi"),
+    ("(lambda: 1)()", None, "Math error: Unsupported function: None"),
+    ("x+1", None, "Math error: Undefined variable: x"),
+    ("e5", None, "Math error: Undefined variable: e5"),
+    ("3 @ 4", None, "Math error: Unsupported operator: MatMult"),
+    ("~1", None, "Math error: Unsupported unary operator: Invert"),
+    ("1<2", None, "Math error: Unsupported node type: Compare"),
+    ("a.b", None, "Math error: Unsupported node type: Attribute"),
+    ("[1, 2][0]", None, "Math error: Unsupported node type: Subscript"),
+    ("min(*[1,2])", None, "Math error: Unsupported node type: Starred"),
+    ("[x for x in [1]]", None, "Math error: Unsupported node type: ListComp"),
+    ("1+", None, "Invalid mathematical expression"),
+    ("", None, "Invalid mathematical expression"),
+    (" 5", None, "Invalid mathematical expression"),
+    ("01", None, "Invalid mathematical expression"),
+    ("1e5.0", None, "Invalid mathematical expression"),
+    ("٣", None, "Invalid mathematical expression"),
+    # The first error in evaluation order is the one reported
+    ("1/0 + foo(1)", None, "Division by zero"),
+    ("x + 1/0", None, "Math error: Undefined variable: x"),
+    ("1/0 + x", None, "Division by zero"),
+    ("[x, 1/0]", None, "Math error: Undefined variable: x"),
+    ("foo(1/0)", None, "Math error: Unsupported function: foo"),
+    ("(1/0) & 2", None, "Division by zero"),
+    ("~(1/0)", None, "Division by zero"),
+    ("max(1, key=1/0)", None, "Math error: 'int' object is not iterable"),
+]
+
+
+@pytest.mark.parametrize("expression, expected, error", CASES)
+def test_calculate(expression, expected, error):
+    result = calculate(expression)
+    assert result.expression == expression
+    assert result.success is (error is None)
+    assert result.error == error
+    assert repr(result.result) == repr(expected)
+
+
+@pytest.mark.parametrize("expression", ["1+2*3", "[1,2]", "1/0", "foo(1)", "7"])
+def test_repeated_calls_match_uncached(expression):
+    expected = SafeCalculator().evaluate(expression)
+    assert calculate(expression) == expected
+    assert calculate(expression) == expected
+
+
+def test_deep_nesting():
+    assert calculate("(" * 90 + "1" + ")" * 90).result == 1
+    assert calculate("-" * 200 + "1").result == 1
+    assert calculate("sum([" + ",".join(map(str, range(500))) + "])").result == 124750
+
+
+def test_expression_too_long():
+    expression = "1+" * (MAX_EXPRESSION_LENGTH // 2) + "1"
+    result = calculate(expression)
+    assert not result.success
+    assert result.error == f"Expression too long (max {MAX_EXPRESSION_LENGTH} characters)"
+
+
+@pytest.mark.parametrize("expression", [
+    "9**9**9",
+    "10**10**7",
+    "pow(10, 10**7)",
+    "2**(2**20)",
+    "2**14001",
+    "'a'*10**9",
+    "10**9*b'a'",
+    "[1]*10**8",
+    "[0]*10**10",
+    "(1, 2)*60000",
+    "[[0]*1000]*1000",
+    "[([0]*10,)*100]*200",
+])
+def test_huge_results_rejected(expression):
+    result = calculate(expression)
+    assert not result.success
+    assert result.error.startswith("Math error: Result too large")
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("2**1000", 2**1000),
+    ("1**10**9", 1),
+    ("(-1)**10**9", 1),
+    ("2**-10**7", 0.0),
+    ("pow(2, 10**100, 7)", 2),
+])
+def test_cheap_powers_allowed(expression, expected):
+    assert calculate(expression).result == expected
+
+
+def test_sequence_repetition_up_to_limit():
+    assert calculate("[0]*100000").result == [0] * 100000
+    assert calculate("3*'ab'").result == "ababab"
+    assert calculate("2**13999").result == 2**13999
+
+
+@pytest.mark.parametrize("expression", ["[1,2]", "([1],2)", "max([1],[2])"])
+def test_cached_results_are_not_shared(expression):
+    first = calculate(expression).result
+    expected = repr(first)
+    (first[0] if isinstance(first, tuple) else first).append(99)
+    assert repr(calculate(expression).result) == expected
+
+
+def test_large_folded_constants_are_left_to_run_time():
+    code = _compile_eval("'a' * 10**5")
+    assert all(len(arg) <= 10 for op, arg in code if isinstance(arg, str))
+    assert calculate("'a' * 10**5").result == "a" * 10**5
+
+
+def test_small_results_are_cached():
+    assert calculate("6*7") is calculate("6*7")
+    assert calculate("1/0") is calculate("1/0")
+
+
+@pytest.mark.parametrize("expression", ["[1, 2, 3]", "(1, 2)", "'a'*2000", "2**10000*2**10000"])
+def test_containers_and_large_results_are_not_cached(expression):
+    assert calculate(expression).success
+    assert expression not in _result_cache
@@ -0,0 +1,64 @@
+"""
+Tests for the filesystem resource helpers
+"""
+
+import os
+
+import pytest
+
+from hjmcpsse.resources.filesystem import get_file_content
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("text, encoding", [
+    ("a" * 5000, "utf-8"),
+    ("é" * 5000, "utf-8"),
+    ("ab" + "😀" * 5000, "utf-8"),
+    ("a" * 4999 + "é😀" * 10, "utf-8"),
+    ("é" * 5000, "utf-16"),
+    ("a" * 4999 + "\r\n" * 10, "utf-8"),
+    ("a" * 5000 + "\r\n" * 10, "utf-8"),
+    ("\r\n" * 6000, "utf-16"),
+    ("é" * 6000, "latin-1"),
+    ("short", "utf-8"),
+])
+@pytest.mark.parametrize("max_chars", [4999, 5000, 5001])
+def test_head_read_matches_full_read(tmp_path, text, encoding, max_chars):
+    path = _write(tmp_path, "file.txt", text.encode(encoding))
+    assert get_file_content(path, max_chars=max_chars) == get_file_content(path)[:max_chars]
+
+
+def test_utf16_bom_is_stripped(tmp_path):
+    path = _write(tmp_path, "bom.txt", "hi".encode("utf-16"))
+    assert get_file_content(path) == "hi"
+    assert get_file_content(path, max_chars=1) == "h"
+
+
+def test_latin1_fallback(tmp_path):
+    path = _write(tmp_path, "latin.txt", "été".encode("latin-1"))
+    assert get_file_content(path, max_chars=10) == "été"
+
+
+def test_head_read_ignores_max_size(tmp_path):
+    path = _write(tmp_path, "big.txt", b"x" * (2 * 1024 * 1024))
+    with pytest.raises(OSError, match="File too large"):
+        get_file_content(path)
+    assert get_file_content(path, max_chars=10) == "x" * 10
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="named pipes are POSIX-only")
+def test_fifo_is_rejected(tmp_path):
+    path = tmp_path / "fifo"
+    os.mkfifo(path)
+    with pytest.raises(OSError, match="Path is not a file"):
+        get_file_content(str(path), max_chars=10)
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(OSError, match="File does not exist"):
+        get_file_content(str(tmp_path / "missing.txt"), max_chars=10)